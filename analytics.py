@@ -0,0 +1,152 @@
+import pandas as pd
+
+# Summary tables kept next to the mirrored reviewer_metrics_prod in DuckDB.
+# They hold running sums, so adding or removing a row only touches the
+# groups that row belongs to. Nulls in key columns are stored as '' / 0
+# because DuckDB primary keys cannot contain nulls.
+SUMMARY_TABLES = {
+    'workload_summary': """
+        Editor VARCHAR NOT NULL,
+        Journal VARCHAR NOT NULL,
+        Year INTEGER NOT NULL,
+        manuscripts BIGINT NOT NULL,
+        completed BIGINT NOT NULL,
+        outstanding BIGINT NOT NULL,
+        turnaround_days BIGINT NOT NULL,
+        turnaround_count BIGINT NOT NULL,
+        PRIMARY KEY (Editor, Journal, Year)
+    """,
+    'outstanding_by_invite_date': """
+        Editor VARCHAR NOT NULL,
+        Date_Invited DATE NOT NULL,
+        outstanding BIGINT NOT NULL,
+        PRIMARY KEY (Editor, Date_Invited)
+    """,
+    'turnaround_histogram': """
+        Year INTEGER NOT NULL,
+        days INTEGER NOT NULL,
+        reviews BIGINT NOT NULL,
+        PRIMARY KEY (Year, days)
+    """,
+}
+
+# Upper bounds in days for the outstanding-review aging buckets
+AGING_BUCKETS = [(7, '0-7 days'), (14, '8-14 days'), (30, '15-30 days'), (60, '31-60 days')]
+AGING_OVERFLOW = '60+ days'
+
+def create_summary_tables(con):
+    """Create the summary tables, filling them from the mirror if they are new"""
+    existing = {row[0] for row in con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+    for table, columns in SUMMARY_TABLES.items():
+        con.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    if not set(SUMMARY_TABLES) <= existing:
+        rebuild_summaries(con)
+
+def rebuild_summaries(con):
+    """Recompute every summary table from the mirrored rows"""
+    for table in SUMMARY_TABLES:
+        con.execute(f"DELETE FROM {table}")
+    update_summaries(con, 1, "SELECT * FROM reviewer_metrics_prod")
+
+def update_summaries(con, sign, source_sql):
+    """Add (sign=1) or remove (sign=-1) the rows selected by source_sql from the summaries.
+
+    Call with -1 on rows before they are replaced or deleted in the mirror,
+    and with 1 on rows after they are inserted.
+    """
+    con.execute(f"""
+    INSERT INTO workload_summary
+    SELECT
+        coalesce(Editor, ''),
+        coalesce(Journal, ''),
+        coalesce(Year, 0),
+        {sign} * count(*),
+        {sign} * count(Date_Completed),
+        {sign} * count(*) FILTER (WHERE Date_Invited IS NOT NULL AND Date_Completed IS NULL),
+        {sign} * coalesce(sum(Date_Completed - Date_Invited), 0),
+        {sign} * count(Date_Completed - Date_Invited)
+    FROM ({source_sql})
+    GROUP BY ALL
+    ON CONFLICT DO UPDATE SET
+        manuscripts = manuscripts + EXCLUDED.manuscripts,
+        completed = completed + EXCLUDED.completed,
+        outstanding = outstanding + EXCLUDED.outstanding,
+        turnaround_days = turnaround_days + EXCLUDED.turnaround_days,
+        turnaround_count = turnaround_count + EXCLUDED.turnaround_count
+    """)
+    con.execute(f"""
+    INSERT INTO outstanding_by_invite_date
+    SELECT coalesce(Editor, ''), Date_Invited, {sign} * count(*)
+    FROM ({source_sql})
+    WHERE Date_Invited IS NOT NULL AND Date_Completed IS NULL
+    GROUP BY ALL
+    ON CONFLICT DO UPDATE SET outstanding = outstanding + EXCLUDED.outstanding
+    """)
+    con.execute(f"""
+    INSERT INTO turnaround_histogram
+    SELECT coalesce(Year, 0), Date_Completed - Date_Invited, {sign} * count(*)
+    FROM ({source_sql})
+    WHERE Date_Invited IS NOT NULL AND Date_Completed IS NOT NULL
+    GROUP BY ALL
+    ON CONFLICT DO UPDATE SET reviews = reviews + EXCLUDED.reviews
+    """)
+
+    # Drop groups that no longer have any rows
+    con.execute("DELETE FROM workload_summary WHERE manuscripts = 0")
+    con.execute("DELETE FROM outstanding_by_invite_date WHERE outstanding = 0")
+    con.execute("DELETE FROM turnaround_histogram WHERE reviews = 0")
+
+def summary_frames(con):
+    """Return the Analytics tab figures, computed from the summary tables only"""
+    workload = con.execute("""
+    SELECT
+        nullif(Editor, '') AS Editor,
+        nullif(Journal, '') AS Journal,
+        nullif(Year, 0) AS Year,
+        manuscripts,
+        completed,
+        outstanding,
+        turnaround_days / nullif(turnaround_count, 0) AS avg_turnaround_days
+    FROM workload_summary
+    ORDER BY Year DESC NULLS LAST, Editor, Journal
+    """).fetchdf()
+
+    turnaround_by_editor = con.execute("""
+    SELECT
+        nullif(Editor, '') AS Editor,
+        sum(turnaround_count) AS reviews,
+        sum(turnaround_days) / nullif(sum(turnaround_count), 0) AS avg_turnaround_days
+    FROM workload_summary
+    GROUP BY ALL
+    HAVING sum(turnaround_count) > 0
+    ORDER BY avg_turnaround_days DESC
+    """).fetchdf()
+
+    turnaround_histogram = con.execute("""
+    SELECT days, sum(reviews) AS reviews
+    FROM turnaround_histogram
+    GROUP BY days
+    ORDER BY days
+    """).fetchdf()
+
+    bucket_cases = "\n".join(
+        f"WHEN current_date - Date_Invited <= {limit} THEN '{label}'"
+        for limit, label in AGING_BUCKETS
+    )
+    aging = con.execute(f"""
+    SELECT
+        CASE {bucket_cases} ELSE '{AGING_OVERFLOW}' END AS age,
+        sum(outstanding) AS outstanding
+    FROM outstanding_by_invite_date
+    GROUP BY ALL
+    """).fetchdf()
+    bucket_order = [label for _, label in AGING_BUCKETS] + [AGING_OVERFLOW]
+    aging['age'] = pd.Categorical(aging['age'], categories=bucket_order, ordered=True)
+    aging = aging.sort_values('age')
+
+    return {
+        'workload': workload,
+        'turnaround_by_editor': turnaround_by_editor,
+        'turnaround_histogram': turnaround_histogram,
+        'aging': aging,
+    }
@@ -0,0 +1,289 @@
+import csv
+import json
+import bisect
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+# Same default as Supabase's PostgREST max-rows setting
+DEFAULT_MAX_ROWS = 1000
+
+class FakeTable:
+    """In-memory table keyed by a primary key column, kept sortable by that key"""
+
+    def __init__(self, key='MS_Number'):
+        self.key = key
+        self.rows = {}
+        self._sorted_keys = []
+        self._dirty = False
+        # Hand out strictly increasing timestamps so cursors behave like a real clock
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def _now(self):
+        self._clock += timedelta(microseconds=1)
+        return self._clock.isoformat()
+
+    def sorted_keys(self):
+        if self._dirty:
+            self._sorted_keys = sorted(self.rows)
+            self._dirty = False
+        return self._sorted_keys
+
+    def load(self, rows):
+        """Seed rows directly, stamping created_at/updated_at like the database would"""
+        for row in rows:
+            stamp = self._now()
+            self.rows[row[self.key]] = {**row, 'created_at': stamp, 'updated_at': stamp}
+        self._dirty = True
+
+    def write(self, records, resolution=None):
+        """Insert records; resolution is None, 'merge-duplicates' or 'ignore-duplicates'"""
+        keys = [record.get(self.key) for record in records]
+        if any(key is None for key in keys):
+            raise PostgrestError(400, '23502', f'null value in column "{self.key}" violates not-null constraint')
+        if len(set(keys)) != len(keys):
+            if resolution == 'merge-duplicates':
+                raise PostgrestError(500, '21000', 'ON CONFLICT DO UPDATE command cannot affect row a second time')
+            raise PostgrestError(409, '23505', 'duplicate key value violates unique constraint')
+        if resolution is None and any(key in self.rows for key in keys):
+            raise PostgrestError(409, '23505', 'duplicate key value violates unique constraint')
+
+        written = []
+        for key, record in zip(keys, records):
+            existing = self.rows.get(key)
+            if existing is None:
+                stamp = self._now()
+                row = {**record, 'created_at': stamp, 'updated_at': stamp}
+                self.rows[key] = row
+                self._dirty = True
+            elif resolution == 'ignore-duplicates':
+                continue
+            else:
+                row = {**existing, **record, 'updated_at': self._now()}
+                self.rows[key] = row
+            written.append(row)
+        return written
+
+    def delete(self, keys):
+        removed = [self.rows.pop(key) for key in keys if key in self.rows]
+        if removed:
+            self._dirty = True
+        return removed
+
+class PostgrestError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.body = {'code': code, 'message': message, 'details': None, 'hint': None}
+
+def _parse_filter(column, expression):
+    operator, _, value = expression.partition('.')
+    if operator == 'in':
+        value = next(csv.reader([value[1:-1]], quotechar='"'), [])
+    elif operator == 'is':
+        value = None if value == 'null' else value
+    return column, operator, value
+
+_OPERATORS = {
+    'eq': lambda a, b: a is not None and str(a) == b,
+    'neq': lambda a, b: a is not None and str(a) != b,
+    'gt': lambda a, b: a is not None and str(a) > b,
+    'gte': lambda a, b: a is not None and str(a) >= b,
+    'lt': lambda a, b: a is not None and str(a) < b,
+    'lte': lambda a, b: a is not None and str(a) <= b,
+    'in': lambda a, b: a is not None and str(a) in b,
+    'is': lambda a, b: a is b,
+}
+
+class FakePostgrest:
+    """A local stand-in for the Supabase REST endpoint used by the sync.
+
+    Supports the subset of PostgREST the code relies on: select with column
+    projection, order (a keyset walk on the primary key, a full sort on any
+    other column), limit, eq/gt/gte/lt/lte/in/is filters, exact counts,
+    inserts, upserts (merge or ignore duplicates), updates, deletes and RPC
+    calls to Python stand-ins registered with function(). Reads are capped
+    at max_rows per request and writes fail on primary key conflicts the
+    way Postgres would. Every request is counted along with the bytes sent
+    each way.
+    """
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, host='127.0.0.1', port=0):
+        self.max_rows = max_rows
+        self.tables = {}
+        self.functions = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_stats(self):
+        self.stats = {'requests': 0, 'bytes_in': 0, 'bytes_out': 0, 'by_method': {}}
+
+    def table(self, name, key='MS_Number'):
+        if name not in self.tables:
+            self.tables[name] = FakeTable(key)
+        return self.tables[name]
+
+    def function(self, name, func):
+        """Serve /rpc/<name> by calling func(fake, params) under the table lock"""
+        self.functions[name] = func
+
+    def _select(self, table, filters, order, limit):
+        key_filters = [f for f in filters if f[0] == table.key and f[1] in ('gt', 'gte')]
+        other_filters = [f for f in filters if f not in key_filters]
+
+        # Walk the primary key index from the keyset position when possible
+        keys = table.sorted_keys()
+        start = 0
+        for _, operator, value in key_filters:
+            position = (bisect.bisect_right if operator == 'gt' else bisect.bisect_left)(keys, value)
+            start = max(start, position)
+
+        in_filter = next((f for f in other_filters if f[0] == table.key and f[1] == 'in'), None)
+        if in_filter:
+            candidates = sorted(k for k in set(in_filter[2]) if k in table.rows)
+            candidates = candidates[bisect.bisect_left(candidates, keys[start]) if start < len(keys) else len(candidates):]
+        else:
+            candidates = keys[start:] if order or key_filters else list(table.rows)
+
+        matched = []
+        total = 0
+        for key in candidates:
+            row = table.rows[key]
+            if all(_OPERATORS[operator](row.get(column), value) for column, operator, value in other_filters):
+                total += 1
+                if limit is None or len(matched) < limit:
+                    matched.append(row)
+        return matched, total
+
+    def _select_sorted(self, table, filters, order, limit):
+        # Ordering on any other column sorts the matching rows in full
+        column, *modifiers = order.split('.')
+        matched, total = self._select(table, filters, None, None)
+        present = sorted((row for row in matched if row.get(column) is not None),
+                         key=lambda row: row[column], reverse='desc' in modifiers)
+        missing = [row for row in matched if row.get(column) is None]
+        nulls_first = 'nullsfirst' in modifiers or ('desc' in modifiers and 'nullslast' not in modifiers)
+        rows = missing + present if nulls_first else present + missing
+        return rows[:limit], total
+
+    def handle(self, method, path, query, headers, body):
+        table_name = path.rstrip('/').split('/')[-1]
+        if '/rpc/' in path:
+            if table_name not in self.functions:
+                raise PostgrestError(404, 'PGRST202', f'Could not find the function {table_name}')
+            with self.lock:
+                return 200, self.functions[table_name](self, body or {}), '*', {}
+        params = parse_qsl(query, keep_blank_values=True)
+        prefer = headers.get('prefer', '')
+
+        select = '*'
+        order = None
+        limit = None
+        on_conflict = None
+        filters = []
+        for name, value in params:
+            if name == 'select':
+                select = value
+            elif name == 'order':
+                order = value
+            elif name == 'limit':
+                limit = int(value)
+            elif name == 'on_conflict':
+                on_conflict = value
+            elif name == 'columns':
+                continue
+            else:
+                filters.append(_parse_filter(name, value))
+
+        with self.lock:
+            table = self.table(table_name)
+            if method == 'GET':
+                row_limit = self.max_rows if limit is None else min(limit, self.max_rows)
+                if order and order.split('.')[0] != table.key:
+                    rows, total = self._select_sorted(table, filters, order, row_limit)
+                else:
+                    rows, total = self._select(table, filters, order, row_limit)
+                content_range = f"0-{len(rows) - 1}/{total}" if rows else f"*/{total}"
+                return 200, rows, select, {'Content-Range': content_range}
+
+            if method == 'POST':
+                if on_conflict and on_conflict != table.key:
+                    raise PostgrestError(400, '42P10', 'there is no unique or exclusion constraint matching the ON CONFLICT specification')
+                records = body if isinstance(body, list) else [body]
+                resolution = None
+                for part in prefer.split(','):
+                    if part.startswith('resolution='):
+                        resolution = part.split('=', 1)[1]
+                return 201, table.write(records, resolution), '*', {}
+
+            matched, _ = self._select(table, filters, None, None)
+            if method == 'PATCH':
+                return 200, table.write([{**row, **body} for row in matched], 'merge-duplicates'), '*', {}
+            if method == 'DELETE':
+                return 200, table.delete([row[table.key] for row in matched]), '*', {}
+
+        raise PostgrestError(405, 'PGRST000', f'unsupported method {method}')
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; without this, Nagle's
+            # algorithm adds ~40ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                url = urlsplit(self.path)
+                headers = {name.lower(): value for name, value in self.headers.items()}
+                try:
+                    body = json.loads(raw) if raw else None
+                    status, rows, select, extra_headers = fake.handle(self.command, url.path, url.query, headers, body)
+                    if select != '*':
+                        columns = select.split(',')
+                        rows = [{column: row.get(column) for column in columns} for row in rows]
+                    payload = json.dumps(rows, default=str).encode('utf-8')
+                except PostgrestError as e:
+                    status, extra_headers = e.status, {}
+                    payload = json.dumps(e.body).encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in extra_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+                with fake.lock:
+                    fake.stats['requests'] += 1
+                    fake.stats['bytes_in'] += len(raw) + len(self.path)
+                    fake.stats['bytes_out'] += len(payload)
+                    by_method = fake.stats['by_method']
+                    by_method[self.command] = by_method.get(self.command, 0) + 1
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _serve
+
+        return Handler
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# What each entry point imports, how long that may take in milliseconds, and
+# modules it must not pull in
+ENTRY_POINTS = {
+    'cli': {
+        'imports': ['cli'],
+        'budget_ms': 50,
+        'forbidden': ['pandas', 'supabase', 'duckdb', 'streamlit'],
+    },
+    'sync': {
+        'imports': ['main'],
+        'budget_ms': 1200,
+        'forbidden': ['streamlit', 'search_index', 'paging'],
+    },
+    # The module-level imports of interface.py, without running the page
+    'app': {
+        'imports': ['streamlit', 'pandas', 'dotenv', 'supabase_client', 'mirror', 'snapshot',
+                    'paging', 'search_index', 'normalize', 'tracing'],
+        'budget_ms': 1500,
+        'forbidden': ['main', 'supabase', 'upsert_pipeline'],
+    },
+}
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+for name in {imports!r}:
+    __import__(name)
+elapsed = (time.perf_counter() - started) * 1000
+print(elapsed)
+print(' '.join(name for name in {forbidden!r} if name in sys.modules))
+"""
+
+def measure(imports, forbidden):
+    """Import the modules in a fresh interpreter; return (milliseconds, forbidden modules loaded)"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(imports=imports, forbidden=forbidden)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    elapsed, loaded = (result.stdout.splitlines() + [''])[:2]
+    return float(elapsed), loaded.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold import times of the app and sync entry points against a budget")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per entry point; the median is compared")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, for slower machines")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for name, entry in ENTRY_POINTS.items():
+        timings = []
+        loaded = set()
+        for _ in range(args.runs):
+            elapsed, forbidden = measure(entry['imports'], entry['forbidden'])
+            timings.append(elapsed)
+            loaded.update(forbidden)
+        budget = entry['budget_ms'] * args.scale
+        median = statistics.median(timings)
+        results.append({
+            'entry': name,
+            'median_ms': round(median, 1),
+            'budget_ms': round(budget, 1),
+            'forbidden_loaded': sorted(loaded),
+            'ok': median <= budget and not loaded,
+        })
+
+    for result in results:
+        status = 'ok' if result['ok'] else 'OVER BUDGET'
+        extra = f", loads {', '.join(result['forbidden_loaded'])}" if result['forbidden_loaded'] else ''
+        print(f"{result['entry']:<6} {result['median_ms']:>8.1f} ms  (budget {result['budget_ms']:.0f} ms{extra})  {status}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Make the top-level modules importable when run from the bench folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_postgrest import FakePostgrest, DEFAULT_MAX_ROWS
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+JOURNALS = ['JRNL', 'ABCD', 'EFGH', 'IJKL', 'MNOP']
+EDITORS = ['Smith', 'Jones', 'Brown', 'Taylor', 'Wilson', 'Lee']
+
+def generate_reviewer_metrics(count, seed=0):
+    """Return `count` synthetic reviewer_metrics rows with unique MS_Numbers.
+
+    Years come in the same mix of clean and messy text the real table has.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        journal = JOURNALS[i % len(JOURNALS)]
+        year = 2020 + (i // len(JOURNALS)) % 10
+        version = f"R{1 + (i // 7) % 3}"
+        ms_number = f"{journal}-D-{year % 100:02d}-{i // 50:05d}{version}"
+        editor = rng.choice(EDITORS)
+        rows.append({
+            'Name': f"{ms_number} ({editor}) {year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}.pdf",
+            'MS_Number': ms_number,
+            'Version': version,
+            'Year': rng.choice([year, str(year), f"c. {year}", f"{year} "]),
+            'Editor': editor,
+            'Journal': journal
+        })
+    return rows
+
+def promote_reviewer_metrics(fake, params):
+    """Python stand-in for sql/promote_reviewer_metrics.sql"""
+    since = params.get('since')
+    source = [
+        row for row in fake.table('reviewer_metrics').rows.values()
+        if since is None or row['created_at'] >= since
+    ]
+    latest = {}
+    for row in sorted(source, key=lambda row: row['created_at']):
+        if row.get('MS_Number') is not None:
+            latest[row['MS_Number']] = row
+
+    prod = fake.table('reviewer_metrics_prod')
+    new = []
+    for ms_number, row in latest.items():
+        if ms_number in prod.rows:
+            continue
+        digits = re.search(r'\d{4}', str(row['Year'])) if row.get('Year') is not None else None
+        new.append({
+            **{column: row.get(column) for column in ('Name', 'MS_Number', 'Version', 'Editor', 'Journal')},
+            'Year': int(digits.group()) if digits else None,
+        })
+    if not params.get('dry_run'):
+        prod.write(new, 'ignore-duplicates')
+
+    return {
+        'scanned': len(source),
+        'unique': len(latest),
+        'already_present': len(latest) - len(new),
+        'new': len(new),
+        'inserted': 0 if params.get('dry_run') else len(new),
+        'cursor': max((row['created_at'] for row in source), default=None),
+        'dry_run': bool(params.get('dry_run')),
+    }
+
+def _md5(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+def _reconcile_hashes(fake, table_name, prefix):
+    """Python stand-in for reconcile_hashes in sql/reconcile_checksums.sql"""
+    hashes = []
+    for row in fake.table(table_name).rows.values():
+        ms_number = row.get('MS_Number')
+        if ms_number is None or not _md5(ms_number).startswith(prefix):
+            continue
+        row_md5 = None
+        if table_name == 'reviewer_metrics_prod':
+            values = [ms_number] + [row.get(column) for column in ('Name', 'Version', 'Year', 'Editor', 'Journal')]
+            values += [None if row.get(column) is None else str(row[column])[:10]
+                       for column in ('Date_Invited', 'Date_Completed')]
+            row_md5 = _md5('\x1f'.join('\\N' if value is None else str(value) for value in values))
+        hashes.append((_md5(ms_number), row_md5, ms_number))
+    return hashes
+
+def reconcile_buckets(fake, params):
+    prefix = params.get('prefix') or ''
+    buckets = {}
+    for key_md5, row_md5, _ in _reconcile_hashes(fake, params['table_name'], prefix):
+        bucket = buckets.setdefault(key_md5[:len(prefix) + 1], [0, 0, None])
+        bucket[0] += 1
+        bucket[1] += int(key_md5[:15], 16)
+        if row_md5 is not None:
+            bucket[2] = (bucket[2] or 0) + int(row_md5[:15], 16)
+    return [
+        {'bucket': bucket, 'row_count': count, 'key_sum': key_sum, 'row_sum': row_sum}
+        for bucket, (count, key_sum, row_sum) in buckets.items()
+    ]
+
+def reconcile_rows(fake, params):
+    return [
+        {'MS_Number': ms_number, 'row_md5': row_md5}
+        for _, row_md5, ms_number in _reconcile_hashes(fake, params['table_name'], params['prefix'])
+    ]
+
+def measure(fake, stage, func, *args, **kwargs):
+    """Run one pipeline stage and return its wall time, traffic and peak memory"""
+    fake.reset_stats()
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {
+        'stage': stage,
+        'wall_s': round(elapsed, 3),
+        'requests': fake.stats['requests'],
+        'bytes_in': fake.stats['bytes_in'],
+        'bytes_out': fake.stats['bytes_out'],
+        'peak_mb': round(peak / 2**20, 1),
+    }
+
+def run_size(fake, size, existing_fraction):
+    import main
+
+    source = fake.table('reviewer_metrics')
+    prod = fake.table('reviewer_metrics_prod')
+    source.rows.clear()
+    prod.rows.clear()
+
+    rows = generate_reviewer_metrics(size)
+    source.load(rows)
+    # Start with part of the history already promoted, like a long-running table
+    promoted = [{**row, 'Year': int(str(row['Year']).strip()[-4:])} for row in rows[:int(size * existing_fraction)]]
+    prod.load(promoted)
+
+    results = []
+    df, stats = measure(fake, 'get_local_data (full)', main.get_local_data, full=True)
+    results.append(stats)
+    _, stats = measure(fake, 'save_to_db (first write-back)', main.save_to_db, df)
+    results.append(stats)
+
+    # A second run with nothing new should cost next to nothing
+    df, stats = measure(fake, 'get_local_data (incremental)', main.get_local_data)
+    results.append(stats)
+    _, stats = measure(fake, 'save_to_db (no changes)', main.save_to_db, df)
+    results.append(stats)
+
+    # Checksum reconciliation against a fresh mirror, in sync and then after
+    # a few rows drift
+    import mirror
+    import reconcile
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        mirror.refresh_mirror(main.get_client(), full=True)
+    _, stats = measure(fake, 'reconcile (in sync)', reconcile.run_reconcile)
+    results.append(stats)
+    keys = prod.sorted_keys()
+    for key in keys[:3]:
+        prod.rows[key]['Editor'] = 'Drifted'
+    prod.delete(keys[-3:])
+    _, stats = measure(fake, 'reconcile --repair (6 drifted)', reconcile.run_reconcile, repair=True)
+    results.append(stats)
+
+    # The same promotion done by the database function
+    prod.rows.clear()
+    prod.load(promoted)
+    _, stats = measure(fake, 'promote_on_server (full)', main.promote_on_server, full=True)
+    results.append(stats)
+
+    for stats in results:
+        stats['rows'] = size
+    return results
+
+def print_table(results):
+    columns = ['rows', 'stage', 'wall_s', 'requests', 'bytes_in', 'bytes_out', 'peak_mb']
+    widths = {column: max(len(column), *(len(str(r[column])) for r in results)) for column in columns}
+    print('  '.join(column.ljust(widths[column]) for column in columns))
+    for result in results:
+        print('  '.join(str(result[column]).ljust(widths[column]) for column in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Supabase sync against a local PostgREST stand-in")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="synthetic reviewer_metrics sizes to run (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="row cap enforced on every read")
+    parser.add_argument("--existing-fraction", type=float, default=0.9,
+                        help="share of rows already in reviewer_metrics_prod before the run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    fake = FakePostgrest(max_rows=args.max_rows).start()
+    fake.function('promote_reviewer_metrics', promote_reviewer_metrics)
+    fake.function('reconcile_buckets', reconcile_buckets)
+    fake.function('reconcile_rows', reconcile_rows)
+    state_dir = tempfile.mkdtemp(prefix='sync-bench-')
+
+    # Point the app at the stand-in before any of its modules read the environment
+    os.environ['SUPABASE_URL'] = fake.url
+    os.environ['SUPABASE_KEY'] = 'bench.fake.key'
+    os.environ['SYNC_JOURNAL_DIR'] = os.path.join(state_dir, 'journal')
+    # The stand-in's clock moves a microsecond per write, so a lookback in
+    # real seconds would re-pull every row on each refresh
+    os.environ['MIRROR_LOOKBACK_SECONDS'] = '0'
+
+    results = []
+    try:
+        for size in args.sizes:
+            os.environ['SYNC_STATE_PATH'] = os.path.join(state_dir, f'sync_state_{size}.json')
+            os.environ['MIRROR_PATH'] = os.path.join(state_dir, f'mirror_{size}.duckdb')
+            os.environ['SNAPSHOT_DIR'] = os.path.join(state_dir, f'snapshots_{size}')
+            for module in ('sync_state', 'sync_journal', 'mirror', 'snapshot', 'reconcile', 'main'):
+                sys.modules.pop(module, None)
+            results.extend(run_size(fake, size, args.existing_fraction))
+    finally:
+        fake.stop()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
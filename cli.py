@@ -0,0 +1,54 @@
+import argparse
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="editorial-helper",
+        description="Sync reviewer_metrics into reviewer_metrics_prod"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="ignore the saved sync state and rebuild from the whole reviewer_metrics table"
+    )
+    parser.add_argument(
+        "--server-side",
+        action="store_true",
+        help="promote new rows with the promote_reviewer_metrics database function instead of downloading them"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="with --server-side, only report what would be promoted"
+    )
+    parser.add_argument(
+        "--reconcile",
+        action="store_true",
+        help="instead of syncing, compare reviewer_metrics, reviewer_metrics_prod and the local mirror "
+             "by checksum and list the rows that differ"
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="with --reconcile, promote missing rows and bring the mirror back in line with the server"
+    )
+    return parser
+
+def main(argv=None):
+    """Console entry point for the sync.
+
+    Arguments are parsed before the sync code is imported, so --help and
+    argument errors return at once, and the Streamlit UI modules are never
+    loaded.
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.reconcile:
+        from reconcile import run_reconcile
+        run_reconcile(repair=args.repair)
+        return
+
+    from main import run_sync
+    run_sync(full=args.full, server_side=args.server_side, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,85 @@
+import os
 import streamlit as st
 import pandas as pd
-import duckdb
 from dotenv import load_dotenv
-from supabase import create_client
-import os
-import sys
-from main import get_local_data, save_to_db
+from supabase_client import get_client
+from mirror import delete_from_mirror, load_analytics, MirrorBusyError
+from snapshot import refresh_snapshot, load_snapshot, snapshot_path
+from paging import PageReader, filter_options, PAGE_COLUMNS, FILTER_COLUMNS, PAGE_SIZE, PAGE_SIZES
+from search_index import SearchIndex
+from normalize import normalize_frame, CATEGORY_COLUMNS, DATE_FORMAT
+from tracing import recent_calls
 
 # Load environment variables
 load_dotenv()
 
+# Streamlit re-runs this script on every interaction, so only lightweight
+# modules are imported above. The sync code in main is imported where it is
+# used, since most sessions never refresh or save.
+
 # Page setup
 st.set_page_config(page_title="Editorial Helper", page_icon="📝", layout="wide")
 st.title("Editorial Helper")
 tab1, tab2, tab3 = st.tabs(["Search", "Edit Data", "Analytics"])
 
+# Timings of the most recent Supabase calls made by this app process
+with st.sidebar.expander("Recent Supabase calls"):
+    if recent_calls:
+        calls = pd.DataFrame(list(recent_calls)[::-1])
+        st.dataframe(
+            calls[['time', 'table', 'operation', 'outcome', 'latency_ms', 'rows', 'response_bytes']],
+            hide_index=True
+        )
+    else:
+        st.text("No calls yet")
+
+@st.cache_resource
+def get_page_reader():
+    # One page cache per process, shared by all sessions
+    return PageReader()
+
+@st.cache_data
+def load_filter_options(path):
+    return filter_options(path)
+
+@st.cache_data
+def load_row_versions(path):
+    # Server row hashes of one snapshot version; versions never change once
+    # written, so they are cached by path
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=['MS_Number', 'row_hash'], memory_map=True)
+    return dict(zip(table.column('MS_Number').to_pylist(), table.column('row_hash').to_pylist()))
+
+def show_page(key, path, ms_numbers=None):
+    """Render sort, filter and paging controls and return the selected page.
+
+    Only the one page is read from the snapshot and sent to the browser.
+    Returns the page as a DataFrame and a tuple identifying it.
+    """
+    options = load_filter_options(path)
+    columns = st.columns([2, 1, 2, 2, 2, 1, 1])
+    sort = columns[0].selectbox("Sort by", PAGE_COLUMNS, index=PAGE_COLUMNS.index('Year'), key=f"{key}_sort")
+    descending = columns[1].toggle("Descending", value=True, key=f"{key}_descending")
+    filters = []
+    for column, name in zip(columns[2:5], FILTER_COLUMNS):
+        choice = column.selectbox(name, ["All"] + options[name], key=f"{key}_{name}")
+        if choice != "All":
+            filters.append((name, choice))
+    page_size = columns[5].selectbox("Rows", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE), key=f"{key}_page_size")
+    page = columns[6].number_input("Page", min_value=1, value=1, step=1, key=f"{key}_page")
+
+    reader = get_page_reader()
+    rows, total = reader.page(path, page - 1, page_size, sort, descending, filters, ms_numbers)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # The filters shrank the result below the requested page
+        page = pages
+        rows, total = reader.page(path, page - 1, page_size, sort, descending, filters, ms_numbers)
+    st.caption(f"Page {page} of {pages}, {total} records")
+
+    return normalize_frame(rows), (path, page, page_size, sort, descending, tuple(filters))
+
 # Use a text_input to get the keywords to filter the dataframe
 with tab1:
     st.header("Search")
@@ -24,6 +89,7 @@ with tab1:
         try:
             st.text("Refreshing data...")
             # Call the functions directly from main.py
+            from main import get_local_data, save_to_db
             df = get_local_data()
             save_to_db(df)
             st.success("Data refreshed successfully!")
@@ -41,85 +107,79 @@ with tab1:
     with search_container:
         col1, col2 = st.columns([1, 3])  # This creates two columns with the first being 1/4 of the width
         with col1:
-            text_search = st.text_input("Search by Manuscript Name, MS Number, or Editor", value="")
+            text_search = st.text_input(
+                "Search by Manuscript Name, MS Number, or Editor",
+                value="",
+                help="All words must match. Limit a word to one field with editor:, name:, ms:, journal:, year: or version:, e.g. editor:smith 2024"
+            )
 
     @st.cache_data(ttl=60)  # Cache for 60 seconds only
     def load_df():
         try:
-            # Initialize Supabase client
-            supabase = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_KEY")
-            )
+            # Get the shared Supabase client
+            supabase = get_client()
 
-            # Query data from Supabase
-            response = supabase.table('reviewer_metrics_prod').select("*").execute()
+            # Refresh the mirror and snapshot only if the server has changed
+            # since the snapshot was written
+            try:
+                refresh_snapshot(supabase)
+            except Exception as e:
+                st.warning(f"Could not refresh from Supabase, showing local data: {str(e)}")
 
-            # Convert to DataFrame
-            df = pd.DataFrame(response.data)
+            # Read the snapshot, already sorted by Year descending. The row
+            # versions are the server hashes used to detect concurrent edits.
+            df = load_snapshot()
+            row_versions = dict(zip(df['MS_Number'], df.pop('row_hash')))
 
-            # Clean Year column before conversion
-            def clean_year(year):
-                try:
-                    if pd.isna(year):
-                        return None
-                    if isinstance(year, str):
-                        # Look for 4-digit year
-                        import re
-                        match = re.search(r'\d{4}', year)
-                        if match:
-                            return int(match.group(0))
-                    return int(year) if pd.notnull(year) else None
-                except:
-                    return None
-
-            # Apply cleaning function to Year column
-            df['Year'] = df['Year'].apply(clean_year)
-
-            # Convert date strings to datetime objects
-            df['Date_Invited'] = pd.to_datetime(df['Date_Invited']).dt.date
-            df['Date_Completed'] = pd.to_datetime(df['Date_Completed']).dt.date
-
-            # Sort by Year descending
-            df = df.sort_values('Year', ascending=False)
-
-            return df
+            # Compact dtypes keep the cached frame small
+            df = normalize_frame(df)
+
+            return df, row_versions
 
         except Exception as e:
-            st.error(f"Error loading data from Supabase: {str(e)}")
-            return pd.DataFrame()
+            st.error(f"Error loading data: {str(e)}")
+            return pd.DataFrame(), {}
+
+    @st.cache_resource
+    def get_search_index():
+        # One index per process, shared by all sessions and kept across reruns
+        return SearchIndex()
+
+    df, row_versions = load_df()
+    path = snapshot_path()
 
-    df = load_df()
+    # Re-index only the rows that changed since the last data load
+    search_index = get_search_index()
+    search_index.sync(df, row_versions)
+
+    column_config = {
+        "Year": st.column_config.NumberColumn(
+            "Year",
+            min_value=2000,
+            max_value=2100,
+            step=1,
+            format="%d"
+        ),
+        "Date_Invited": st.column_config.DateColumn(
+            "Date Invited",
+            format="YYYY-MM-DD",
+            step=1
+        ),
+        "Date_Completed": st.column_config.DateColumn(
+            "Date Completed",
+            format="YYYY-MM-DD",
+            step=1
+        )
+    }
 
     if text_search:
-        m1 = df["MS_Number"].str.contains(text_search, case=False, na=False)
-        m2 = df["Name"].str.contains(text_search, case=False, na=False)
-        m3 = df["Editor"].str.contains(text_search, case=False, na=False)
-        df_search = df[m1 | m2 | m3]
+        matches = search_index.search(text_search)
         st.text("Search Results")
-        st.write(df_search)
+        page_df, _ = show_page("search", path, ms_numbers=matches)
     else:
         st.text("All Records")
-        column_config = {
-            "Year": st.column_config.NumberColumn(
-                "Year",
-                min_value=2000,
-                max_value=2100,
-                step=1,
-                format="%d"
-            ),
-            "Date_Invited": st.column_config.DateColumn(
-                "Date Invited",
-                format="YYYY-MM-DD",
-                step=1
-            ),
-            "Date_Completed": st.column_config.DateColumn(
-                "Date Completed",
-                format="YYYY-MM-DD",
-                step=1
-            )
-        }
-        st.dataframe(df, column_config=column_config)
+        page_df, _ = show_page("all", path)
+    st.dataframe(page_df, column_config=column_config, hide_index=True)
 
 with tab2:
     st.header("Edit Data")
@@ -144,34 +204,153 @@ with tab2:
         )
     }
 
-    edf = st.data_editor(df, column_config=column_config)
+    def to_db_value(column, value):
+        # Convert editor values to JSON types Supabase accepts
+        if value is None or pd.isna(value):
+            return None
+        if column == 'Year':
+            return int(value)
+        if isinstance(value, pd.Timestamp):
+            return value.strftime(DATE_FORMAT)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if hasattr(value, 'item'):
+            return value.item()
+        return value
+
+    def to_db_record(record):
+        return {column: to_db_value(column, value) for column, value in record.items()}
+
+    def has_pending_edits(key):
+        changes = st.session_state.get(key) if key else None
+        return bool(changes and (changes["edited_rows"] or changes["added_rows"] or changes["deleted_rows"]))
+
+    # The editor keeps reading the snapshot it was opened on while it has
+    # unsaved changes, since its edits refer to rows by position; a newer
+    # snapshot is picked up once they are saved or discarded
+    edit_path = st.session_state.get("edit_snapshot")
+    if edit_path != path and has_pending_edits(st.session_state.get("edit_editor_key")):
+        if not os.path.exists(edit_path):
+            st.warning("The data changed too much since you started editing; unsaved changes were discarded.")
+            del st.session_state[st.session_state["edit_editor_key"]]
+            edit_path = path
+    else:
+        edit_path = path
+    st.session_state["edit_snapshot"] = edit_path
+
+    # Edit one page at a time; each page gets its own editor state so edits
+    # are never applied to rows of another page
+    edit_df, page_id = show_page("edit", edit_path)
+    editor_key = f"edit_data_{abs(hash(page_id[1:]))}"
+    st.session_state["edit_editor_key"] = editor_key
+    st.caption("Save your changes before moving to another page.")
+    if edit_path != path:
+        st.caption("Newer data is available and will be shown once your changes are saved.")
+
+    # Edit categoricals as free text rather than a fixed list of choices
+    text_columns = {column: 'object' for column in CATEGORY_COLUMNS if column in edit_df.columns}
+    st.data_editor(edit_df.astype(text_columns), column_config=column_config, num_rows="dynamic",
+                   hide_index=True, key=editor_key)
     if st.button('Save'):
-        try:
-            # Initialize Supabase client
-            supabase = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_KEY")
-            )
+        # Only the rows touched in the editor are sent, based on its change set
+        changes = st.session_state[editor_key]
+        upserts = []
+        deletes = []
 
-            # Convert dates to string format for Supabase
-            save_df = edf.copy()
-            save_df['Date_Invited'] = save_df['Date_Invited'].astype(str)
-            save_df['Date_Completed'] = save_df['Date_Completed'].astype(str)
+        for position, edits in changes["edited_rows"].items():
+            original = edit_df.iloc[int(position)].to_dict()
+            record = {**original, **edits}
+            if record['MS_Number'] != original['MS_Number']:
+                # Changing the key replaces the old row rather than updating it
+                deletes.append(original['MS_Number'])
+            upserts.append(to_db_record(record))
 
-            # Convert DataFrame to records
-            records = save_df.to_dict('records')
+        for added in changes["added_rows"]:
+            if not added.get('MS_Number'):
+                st.error("New rows need an MS_Number before they can be saved")
+                st.stop()
+            upserts.append(to_db_record(added))
 
-            # Update Supabase using upsert
-            response = supabase.table('reviewer_metrics_prod').upsert(records).execute()
-            st.success(f"Successfully saved {len(records)} records to Supabase!")
+        for position in changes["deleted_rows"]:
+            deletes.append(edit_df.iloc[int(position)]['MS_Number'])
 
-            # Clear cache and refresh
-            st.cache_data.clear()
-            st.rerun()
+        if not upserts and not deletes:
+            st.info("No changes to save")
+        else:
+            from main import save_changes, SaveConflictError
+            try:
+                # Get the shared Supabase client
+                supabase = get_client()
 
-        except Exception as e:
-            st.error(f"Error saving to Supabase: {str(e)}")
-            print(f"Full error: {str(e)}")  # For debugging
+                # Check against the snapshot the edits were made on, which is
+                # older than the current one while the editor is pinned
+                saved, deleted, failures = save_changes(supabase, upserts, deletes, load_row_versions(edit_path))
+
+                # Remove deleted rows from the mirror now rather than at the
+                # next refresh, unless a sync is holding it
+                try:
+                    delete_from_mirror(deletes)
+                except MirrorBusyError:
+                    st.warning("The local copy is busy; deleted rows will disappear after the next refresh.")
+                if failures:
+                    st.error(f"Saved {saved} records but could not save {len(failures)}:")
+                    st.dataframe(pd.DataFrame(failures)[['MS_Number', 'attempts', 'error']], hide_index=True)
+                else:
+                    st.success(f"Successfully saved {saved} and deleted {deleted} records in Supabase!")
+
+                    # The saved edits no longer hold the editor on this snapshot
+                    del st.session_state[editor_key]
+
+                    # Clear cache and refresh
+                    st.cache_data.clear()
+                    st.rerun()
+
+            except SaveConflictError as e:
+                st.error(f"{str(e)}. Refresh the data and apply your edits again.")
+
+            except Exception as e:
+                st.error(f"Error saving to Supabase: {str(e)}")
+                print(f"Full error: {str(e)}")  # For debugging
 
 with tab3:
-    st.header("Analytics Coming Soon!")
+    st.header("Analytics")
+
+    # The summary tables are kept up to date as rows sync into the mirror,
+    # so this only reads a handful of pre-aggregated rows
+    @st.cache_data(ttl=60)
+    def load_summaries():
+        return load_analytics()
+
+    try:
+        summaries = load_summaries()
+    except MirrorBusyError:
+        st.warning("The local copy is being updated by a sync. Try again in a moment.")
+        st.stop()
+    workload = summaries['workload']
+    turnaround_by_editor = summaries['turnaround_by_editor']
+    aging = summaries['aging']
+
+    col1, col2, col3 = st.columns(3)
+    turnaround_count = turnaround_by_editor['reviews'].sum()
+    avg_turnaround = (
+        (turnaround_by_editor['avg_turnaround_days'] * turnaround_by_editor['reviews']).sum() / turnaround_count
+        if turnaround_count else None
+    )
+    col1.metric("Manuscripts", int(workload['manuscripts'].sum()))
+    col2.metric("Outstanding Reviews", int(aging['outstanding'].sum()))
+    col3.metric("Average Turnaround", f"{avg_turnaround:.1f} days" if avg_turnaround is not None else "n/a")
+
+    st.subheader("Reviewer Turnaround by Editor")
+    st.bar_chart(turnaround_by_editor.set_index('Editor')['avg_turnaround_days'])
+    st.bar_chart(summaries['turnaround_histogram'].set_index('days')['reviews'])
+
+    st.subheader("Outstanding Review Aging")
+    st.bar_chart(aging.set_index('age')['outstanding'])
+
+    st.subheader("Workload")
+    group_by = st.multiselect("Group by", ['Editor', 'Journal', 'Year'], default=['Editor'])
+    if group_by:
+        grouped = workload.groupby(group_by, dropna=False)[['manuscripts', 'completed', 'outstanding']].sum()
+        st.dataframe(grouped.sort_values('manuscripts', ascending=False))
+    else:
+        st.dataframe(workload)
@@ -1,185 +1,405 @@
 import re
 import os
+import itertools
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-from supabase import create_client
+from supabase_client import get_client
+from sync_state import load_sync_state, save_sync_state, row_hash
+from normalize import clean_year, to_records
+from tracing import start_run, write_run_summary
+from upsert_pipeline import run_upserts, run_batches, chunked
+from sync_journal import SyncJournal
+from snapshot import refresh_snapshot
 
 # Load environment variables
 load_dotenv()
 
-def get_local_data():
-    # Initialize Supabase client
-    supabase = create_client(
-        os.getenv("SUPABASE_URL"),
-        os.getenv("SUPABASE_KEY")
-    )
-
-    print("\n=== Starting Data Import Process ===")
-
-    # Query the data from Supabase reviewer_metrics table
-    print("\nQuerying reviewer_metrics table...")
-    result = supabase.table('reviewer_metrics').select(
-        'Name',
-        'MS_Number',
-        'Version',
-        'Year',
-        'Editor',
-        'Journal'
-    ).execute()
-
-    print(f"Found {len(result.data)} records in reviewer_metrics")
-
-    # Get existing data from reviewer_metrics_prod table
-    print("\nQuerying reviewer_metrics_prod table...")
-    existing_result = supabase.table('reviewer_metrics_prod').select(
-        'MS_Number'
-    ).execute()
-
-    print(f"Found {len(existing_result.data)} records in reviewer_metrics_prod")
-
-    # Convert to DataFrames
-    df = pd.DataFrame(result.data)
-    print(f"df columns: {df.columns.tolist()}")
-    try:
-        existing_df = pd.DataFrame(existing_result.data)
-        print(f"existing_df columns: {existing_df.columns.tolist()}")
-        if 'MS_Number' not in existing_df.columns:
-            print("Error: 'MS_Number' column not found in existing_df. Available columns:", existing_df.columns.tolist())
-            existing_ms_numbers = []
+# Number of records sent per upsert request to reviewer_metrics_prod
+BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "500"))
+
+# Number of rows requested per page when reading a table. Keep this at or
+# below the PostgREST max-rows setting (1000 on Supabase by default).
+PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+
+# Column of reviewer_metrics used as the incremental sync high-water mark
+CURSOR_COLUMN = os.getenv("SYNC_CURSOR_COLUMN", "created_at")
+
+# Machine-readable summary of the Supabase calls made by the last sync run
+SYNC_SUMMARY_PATH = os.getenv("SYNC_SUMMARY_PATH", "sync_run_summary.json")
+
+# Columns of reviewer_metrics_prod maintained by the database, never written back
+SERVER_MANAGED_COLUMNS = ['created_at', 'updated_at']
+
+# Number of MS_Numbers sent per `in` filter, to keep request URLs short
+LOOKUP_CHUNK_SIZE = 200
+
+# Columns of reviewer_metrics copied into reviewer_metrics_prod
+SOURCE_COLUMNS = ['Name', 'MS_Number', 'Version', 'Year', 'Editor', 'Journal']
+
+def fetch_pages(supabase, table_name, columns=("*",), page_size=PAGE_SIZE, filters=()):
+    """Yield a table page by page using keyset pagination on MS_Number.
+
+    Each page is a list of row dicts. Rows with a null MS_Number are never
+    returned, as they cannot be ordered by the key. `filters` is a list of
+    (operator, column, value) tuples such as ('gte', 'created_at', cursor).
+    """
+    columns = list(columns)
+    if "*" not in columns and "MS_Number" not in columns:
+        columns.append("MS_Number")
+
+    last_ms_number = None
+    while True:
+        query = supabase.table(table_name).select(*columns).order('MS_Number').limit(page_size)
+        for operator, column, value in filters:
+            query = getattr(query, operator)(column, value)
+        if last_ms_number is not None:
+            query = query.gt('MS_Number', last_ms_number)
+        page = query.execute().data
+
+        # Stop on an empty page rather than a short one, so a server-side row
+        # cap smaller than page_size cannot end the scan early
+        if not page:
+            return
+        yield page
+        last_ms_number = page[-1]['MS_Number']
+
+def fetch_table(supabase, table_name, columns=("*",), page_size=PAGE_SIZE, filters=()):
+    """Read a whole table into a DataFrame through fetch_pages"""
+    records = []
+    for page in fetch_pages(supabase, table_name, columns=columns, page_size=page_size, filters=filters):
+        records.extend(page)
+    return pd.DataFrame(records)
+
+def fetch_frames(supabase, table_name, columns=("*",), page_size=PAGE_SIZE, filters=()):
+    """Yield a table as one DataFrame per page, for callers that work a page at a time"""
+    for page in fetch_pages(supabase, table_name, columns=columns, page_size=page_size, filters=filters):
+        yield pd.DataFrame(page)
+
+def fetch_pages_for(supabase, table_name, ms_numbers, columns=("*",)):
+    """Yield pages of the rows matching the given MS_Numbers, in chunked in() lookups"""
+    ms_numbers = list(ms_numbers)
+    for i in range(0, len(ms_numbers), LOOKUP_CHUNK_SIZE):
+        filters = [('in_', 'MS_Number', ms_numbers[i:i + LOOKUP_CHUNK_SIZE])]
+        yield from fetch_pages(supabase, table_name, columns=columns, filters=filters)
+
+def find_existing_ms_numbers(supabase, table_name, ms_numbers=None, between=None):
+    """Return the set of MS_Numbers present in a table.
+
+    With ms_numbers given, only those are looked up. With between, a
+    (first, last) pair, only that range of keys is read, compared in the
+    database's own collation. Otherwise the whole MS_Number column is scanned.
+    """
+    if between is not None:
+        first, last = between
+        pages = fetch_pages(supabase, table_name, columns=('MS_Number',),
+                            filters=[('gte', 'MS_Number', first), ('lte', 'MS_Number', last)])
+    elif ms_numbers is None:
+        pages = fetch_pages(supabase, table_name, columns=('MS_Number',))
+    else:
+        pages = fetch_pages_for(supabase, table_name, ms_numbers, columns=('MS_Number',))
+
+    existing_ms_numbers = set()
+    for page in pages:
+        existing_ms_numbers.update(record['MS_Number'] for record in page)
+    return existing_ms_numbers
+
+def count_rows(supabase, table_name):
+    """Return the number of rows in a table without downloading them"""
+    return supabase.table(table_name).select('MS_Number', count='exact').limit(1).execute().count
+
+def save_cursor(state, cursor):
+    """Persist the reviewer_metrics high-water mark for the next incremental run"""
+    if cursor is None or cursor == state.get('reviewer_metrics_cursor'):
+        return
+    state['reviewer_metrics_cursor'] = cursor
+    save_sync_state(state)
+    print(f"Saved sync cursor {CURSOR_COLUMN} = {cursor}")
+
+def track_cursor(pages, stats):
+    """Fetch stage: count the rows read and keep the highest cursor value seen in stats['cursor']"""
+    for page in pages:
+        stats['fetched'] += len(page)
+        values = [record[CURSOR_COLUMN] for record in page if record.get(CURSOR_COLUMN) is not None]
+        if stats['cursor'] is not None:
+            values.append(stats['cursor'])
+        if values:
+            stats['cursor'] = max(values)
+        yield page
+
+def drop_existing(supabase, pages, table_name, stats, by_range=False):
+    """Filter stage: drop the rows of each page whose MS_Number is already in table_name.
+
+    Pages must come in MS_Number order, as fetch_pages returns them. With
+    by_range the table's keys between each page's first and last MS_Number
+    are read, which suits a full scan where the pages cover every key;
+    otherwise each page's own MS_Numbers are looked up.
+    """
+    for page in pages:
+        if by_range:
+            existing = find_existing_ms_numbers(supabase, table_name,
+                                                between=(page[0]['MS_Number'], page[-1]['MS_Number']))
         else:
-            existing_ms_numbers = existing_df['MS_Number'].values.tolist()
-    except Exception as e:
-        print(f"Error converting existing_result.data to DataFrame: {e}")
-        existing_ms_numbers = []
-
-
-    # Get list of existing MS_Numbers
-    print(f"\nNumber of existing MS_Numbers: {len(existing_ms_numbers)}")
-
-    # Filter for new rows
-    new_rows = df[~df['MS_Number'].isin(existing_ms_numbers)]
-    print(f"\nFound {len(new_rows)} new records to import")
-
-    if not new_rows.empty:
-        print("\nSample of new records:")
-        print(new_rows[['MS_Number', 'Name', 'Year']].head())
+            existing = find_existing_ms_numbers(supabase, table_name, {record['MS_Number'] for record in page})
+        new_rows = [record for record in page if record['MS_Number'] not in existing]
+        stats['existing'] += len(page) - len(new_rows)
+        if new_rows:
+            yield new_rows
+
+def clean_new_rows(pages, stats):
+    """Clean stage: turn each page of new rows into records ready for reviewer_metrics_prod"""
+    for page in pages:
+        new_rows = pd.DataFrame(page).drop(columns=[CURSOR_COLUMN])
+
+        # Remove duplicate columns, rows with null MS_Number and repeated MS_Numbers
+        new_rows = new_rows.loc[:, ~new_rows.columns.duplicated()]
+        new_rows = new_rows.dropna(subset=['MS_Number'])
+        new_rows = new_rows.drop_duplicates(subset=['MS_Number'], keep='last')
 
-        # Clean up the new rows
-        new_rows = new_rows.copy()
+        new_rows = new_rows.assign(Year=clean_year(new_rows['Year']))
+        records = to_records(new_rows)
+        stats['new'] += len(records)
+        yield from records
 
-        # Remove duplicate columns
-        new_rows = new_rows.loc[:, ~new_rows.columns.duplicated()]
+def get_local_data(full=False):
+    """Promote new reviewer_metrics rows into reviewer_metrics_prod.
 
-        # Remove rows with null MS_Number
-        new_rows = new_rows.dropna(subset=['MS_Number'])
-        print(f"After removing null MS_Number: {len(new_rows)} records")
+    The import runs as a pipeline of generator stages (fetch, filter,
+    clean, write), each working on one page of PAGE_SIZE rows, so memory
+    stays bounded by the page and batch sizes rather than the table.
+    Returns the rows of reviewer_metrics_prod as a lazy stream of one
+    DataFrame per page, for save_to_db.
+    """
+    # Get the shared Supabase client
+    supabase = get_client()
 
-        # Remove duplicates based on MS_Number
-        new_rows = new_rows.drop_duplicates(subset=['MS_Number'], keep='last')
-        print(f"After removing duplicates: {len(new_rows)} records")
-
-        # Clean Year column
-        def clean_year(year):
-            try:
-                if pd.isna(year):
-                    return None
-                if isinstance(year, str):
-                    # Look for 4-digit year
-                    import re
-                    match = re.search(r'\d{4}', year)
-                    if match:
-                        return int(match.group(0))
-                return int(year) if pd.notnull(year) else None
-            except:
-                return None
-
-        new_rows['Year'] = new_rows['Year'].apply(clean_year)
-
-        # Convert to records and ensure no NaN values
-        new_rows = new_rows.replace({pd.NA: None})
-        new_rows = new_rows.where(pd.notnull(new_rows), None)
-
-        # Convert to records
-        records = new_rows.to_dict('records')
-        print(f"\nPrepared {len(records)} records for import")
+    print("\n=== Starting Data Import Process ===")
 
+    # Finish a promotion that was cut short before looking for new rows
+    journal = SyncJournal('promote')
+    state = load_sync_state()
+    run = resume_journal(supabase, journal, on_conflict='MS_Number', ignore_duplicates=True)
+    if run is not None:
+        # A plan cut short never saw all its rows, so its cursor is not safe to keep
+        if run['complete'] and not run['failed']:
+            save_cursor(state, run['meta'].get('cursor'))
+        journal.finish()
+
+    # Only fetch rows added since the last successful sync, unless a full
+    # rebuild was requested
+    cursor = None if full else state.get('reviewer_metrics_cursor')
+    filters = []
+    if cursor is not None:
+        print(f"\nIncremental sync: fetching rows with {CURSOR_COLUMN} >= {cursor}")
+        # gte rather than gt so rows sharing the cursor value are not skipped;
+        # the ones already promoted are filtered out below
+        filters.append(('gte', CURSOR_COLUMN, cursor))
+    else:
+        print("\nFull sync: fetching all rows")
+
+    stats = {'fetched': 0, 'existing': 0, 'new': 0, 'cursor': cursor}
+    pages = fetch_pages(supabase, 'reviewer_metrics', columns=(*SOURCE_COLUMNS, CURSOR_COLUMN), filters=filters)
+    pages = track_cursor(pages, stats)
+    # A full scan reads every key, so look up prod by key range rather than
+    # sending each page's MS_Numbers
+    pages = drop_existing(supabase, pages, 'reviewer_metrics_prod', stats, by_range=cursor is None)
+    records = clean_new_rows(pages, stats)
+
+    # Pull the first new record before starting a write, so a run with
+    # nothing to import leaves no journal behind
+    print("\nQuerying reviewer_metrics table...")
+    first = next(records, None)
+    if first is None:
+        print(f"Found {stats['fetched']} records in reviewer_metrics, "
+              f"{stats['existing']} already in reviewer_metrics_prod")
+        print("No new records to import")
+        save_cursor(state, stats['cursor'])
+    else:
         # Insert new records into reviewer_metrics_prod
         try:
-            print("\nAttempting to import records...")
-            response = supabase.table('reviewer_metrics_prod').upsert(records).execute()
-            print(f"Successfully imported {len(records)} new records to reviewer_metrics_prod")
+            print("\nImporting new records...")
+            # Insert only, so a row that reached prod meanwhile (and may have
+            # been edited there) is never overwritten
+            report = journaled_upsert(supabase, journal, 'reviewer_metrics_prod',
+                                      itertools.chain([first], records), meta=stats,
+                                      on_conflict='MS_Number', ignore_duplicates=True)
+            print(f"Found {stats['fetched']} records in reviewer_metrics, "
+                  f"{stats['existing']} already in reviewer_metrics_prod, {stats['new']} new")
+            print(f"Imported {report['written']} new records to reviewer_metrics_prod "
+                  f"with {len(report['failed'])} errors")
 
             # Verify the import
-            verify_result = supabase.table('reviewer_metrics_prod').select("*").execute()
-            print(f"\nVerification - Total records in reviewer_metrics_prod: {len(verify_result.data)}")
+            print(f"\nVerification - Total records in reviewer_metrics_prod: {count_rows(supabase, 'reviewer_metrics_prod')}")
 
-            # Check if our new records are present
-            imported_ms_numbers = [record['MS_Number'] for record in records]
-            verify_df = pd.DataFrame(verify_result.data)
-            found_count = verify_df[verify_df['MS_Number'].isin(imported_ms_numbers)].shape[0]
-            print(f"Found {found_count} of {len(imported_ms_numbers)} imported records in the database")
+            # Only advance the cursor once the new rows are safely in prod
+            if not report['failed']:
+                save_cursor(state, stats['cursor'])
+            journal.finish()
 
         except Exception as e:
             print(f"Error importing records: {str(e)}")
             print("Full error details:")
             import traceback
             print(traceback.format_exc())
-    else:
-        print("No new records to import")
-
-    # Get the updated data from reviewer_metrics_prod
-    updated_result = supabase.table('reviewer_metrics_prod').select("*").execute()
-    combined_df = pd.DataFrame(updated_result.data)
 
-    return combined_df
-
-def save_to_db(df):
-    try:
-        # Initialize Supabase client
-        supabase = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_KEY")
+    # The updated rows of reviewer_metrics_prod, read as they are consumed
+    return fetch_frames(supabase, 'reviewer_metrics_prod')
+
+def promote_ms_numbers(supabase, ms_numbers):
+    """Copy the given MS_Numbers from reviewer_metrics into reviewer_metrics_prod.
+
+    Rows already in prod are left as they are. Returns the upsert report.
+    """
+    stats = {'new': 0}
+    pages = fetch_pages_for(supabase, 'reviewer_metrics', ms_numbers, columns=(*SOURCE_COLUMNS, CURSOR_COLUMN))
+    return upsert_in_batches(supabase, 'reviewer_metrics_prod', clean_new_rows(pages, stats),
+                             on_conflict='MS_Number', ignore_duplicates=True)
+
+def promote_on_server(full=False, dry_run=False):
+    """Promote new reviewer_metrics rows with the promote_reviewer_metrics SQL function.
+
+    Nothing but the RPC call and its counts crosses the network. The
+    function must be installed from sql/promote_reviewer_metrics.sql, and
+    filters on created_at whatever SYNC_CURSOR_COLUMN says.
+    """
+    supabase = get_client()
+    state = load_sync_state()
+    cursor = None if full else state.get('reviewer_metrics_cursor')
+    print(f"\nPromoting reviewer_metrics rows on the server{f' created since {cursor}' if cursor else ''}...")
+
+    result = supabase.rpc('promote_reviewer_metrics', {'since': cursor, 'dry_run': dry_run}).execute().data
+    print(f"Scanned {result['scanned']} rows, {result['unique']} unique MS_Numbers, "
+          f"{result['already_present']} already in reviewer_metrics_prod")
+    if dry_run:
+        print(f"Dry run: {result['new']} records would be imported")
+    else:
+        print(f"Imported {result['inserted']} new records to reviewer_metrics_prod")
+        save_cursor(state, result['cursor'] or cursor)
+    return result
+
+def upsert_in_batches(supabase, table_name, records, batch_size=BATCH_SIZE, **upsert_options):
+    """Upsert records in concurrent batches, splitting failed batches to isolate bad rows.
+
+    Extra keyword arguments such as on_conflict or ignore_duplicates are
+    passed through to each upsert request. Returns the upsert_pipeline
+    report: 'written' and 'failed' (the records that could not be saved)
+    plus one entry per record in 'results' with its status, attempts and
+    error.
+    """
+    return run_upserts(supabase, table_name, records, batch_size, **upsert_options)
+
+def journaled_upsert(supabase, journal, table_name, records, batch_size=BATCH_SIZE, meta=None, **upsert_options):
+    """Upsert records like upsert_in_batches, recording each batch in a write-ahead journal.
+
+    records may be any iterable, including a generator that is still
+    reading from the server; each batch is journaled as it is cut. `meta`
+    is stored with the plan once records is exhausted. The journal is left
+    open; call journal.finish() once the outcome has been recorded, so a
+    crash before that resumes through resume_journal.
+    """
+    journal.begin(table_name, options=upsert_options)
+    batches = journal.plan(enumerate(chunked(records, batch_size)), meta=meta)
+    return run_batches(supabase, table_name, batches, on_batch=journal.ack, **upsert_options)
+
+def resume_journal(supabase, journal, **upsert_options):
+    """Send the unacknowledged batches of an interrupted run, if there was one.
+
+    Keyword arguments override the upsert options stored in the journal.
+    Returns the run from journal.open_run() with 'failed' updated, or None.
+    The journal is left open for the caller to finish.
+    """
+    run = journal.open_run()
+    if run is None:
+        return None
+
+    print(f"\nResuming the {journal.stage} run started {run['started']}: "
+          f"{len(run['pending'])} of {len(run['batches'])} batches were not confirmed")
+    if run['pending']:
+        report = run_batches(
+            supabase, run['table'],
+            [(batch_id, run['batches'][batch_id]) for batch_id in run['pending']],
+            on_batch=journal.ack, **{**run['options'], **upsert_options}
         )
-
-      
+        run['failed'] |= {record.get('MS_Number') for record in report['failed']}
+    return run
+
+def changed_records(frames, row_hashes, new_hashes, stats):
+    """Yield the write-back records whose content hash differs from row_hashes, a frame at a time.
+
+    The hash of each record yielded is put in new_hashes, to be remembered
+    once the write is confirmed.
+    """
+    for df in frames:
+        if df.empty:
+            continue
+
+        # Remove duplicate columns and rows with null MS_Number
+        records_df = df.loc[:, ~df.columns.duplicated()]
+        records_df = records_df.dropna(subset=['MS_Number'])
+
+        # Leave timestamps to the database so they do not count as changes
+        records_df = records_df.drop(columns=[
+            column for column in SERVER_MANAGED_COLUMNS if column in records_df.columns
+        ])
+
+        # Keep the most recent record for each MS_Number
+        records_df = records_df.drop_duplicates(subset=['MS_Number'], keep='last')
+
+        for record in to_records(records_df):
+            stats['unique'] += 1
+            ms_number = str(record['MS_Number'])
+            digest = row_hash(record)
+            if row_hashes.get(ms_number) != digest:
+                new_hashes[ms_number] = digest
+                stats['changed'] += 1
+                yield record
+
+def save_to_db(frames, batch_size=BATCH_SIZE, force=False):
+    """Write reviewer_metrics_prod rows back, sending only those changed since the last sync.
+
+    frames is a DataFrame or an iterable of them, such as the page stream
+    returned by get_local_data; it is cleaned and written a frame at a time.
+    """
+    try:
+        # Get the shared Supabase client
+        supabase = get_client()
 
         try:
-            # Clean up the DataFrame before saving
-            # Remove duplicate columns
-            records_df = df.loc[:, ~df.columns.duplicated()]
-
-            # Remove rows with null MS_Number
-            records_df = records_df.dropna(subset=['MS_Number'])
-
-            # Convert to records and ensure no NaN values
-            records_df = records_df.replace({pd.NA: None})
-            records_df = records_df.where(pd.notnull(records_df), None)
-
-            # Get unique MS_Number values
-            unique_ms_numbers = records_df['MS_Number'].unique()
-            print(f"Found {len(unique_ms_numbers)} unique MS_Number values")
-
-            # Process records one by one to avoid duplicate constraint errors
-            total_processed = 0
-            total_errors = 0
-
-            for ms_number in unique_ms_numbers:
-                # Get the most recent record for this MS_Number
-                record = records_df[records_df['MS_Number'] == ms_number].iloc[-1].to_dict()
-
-                try:
-                    response = supabase.table('reviewer_metrics_prod').upsert([record]).execute()
-                    total_processed += 1
-                    if total_processed % 100 == 0:
-                        print(f"Processed {total_processed} records")
-                except Exception as e:
-                    print(f"Error processing MS_Number {ms_number}: {str(e)}")
-                    total_errors += 1
+            # Not journaled: the rows come fresh from prod on every run, and
+            # replaying an old copy of them could undo edits made since
+            if isinstance(frames, pd.DataFrame):
+                frames = [frames]
+
+            # Only send rows whose content differs from what was last written
+            state = load_sync_state()
+            row_hashes = {} if force else state.get('row_hashes', {})
+            stats = {'unique': 0, 'changed': 0}
+            new_hashes = {}
+            changed = changed_records(frames, row_hashes, new_hashes, stats)
+
+            first = next(changed, None)
+            if first is None:
+                print(f"0 of {stats['unique']} records changed since the last sync")
+                print("Nothing to save")
+                return
+
+            report = upsert_in_batches(supabase, 'reviewer_metrics_prod',
+                                       itertools.chain([first], changed), batch_size=batch_size)
+            print(f"{stats['changed']} of {stats['unique']} records changed since the last sync")
+            print(f"Processed {report['written']} records in {report['elapsed_s']:.2f}s "
+                  f"with {len(report['failed'])} errors and {report['retries']} retries")
+
+            # Remember what was written so unchanged rows are skipped next time
+            failed = {str(record['MS_Number']) for record in report['failed']}
+            row_hashes.update(
+                (ms_number, digest) for ms_number, digest in new_hashes.items() if ms_number not in failed
+            )
+            state['row_hashes'] = row_hashes
+            save_sync_state(state)
 
             # Verify the total number of records
-            result = supabase.table('reviewer_metrics_prod').select("*").execute()
-            print(f"Total records in Supabase: {len(result.data)}")
+            print(f"Total records in Supabase: {count_rows(supabase, 'reviewer_metrics_prod')}")
+            return report
 
         except Exception as e:
             print(f"Error saving to Supabase: {str(e)}")
@@ -193,9 +413,67 @@ def save_to_db(df):
         import traceback
         print(traceback.format_exc())
 
-def main():
-    df = get_local_data()
-    save_to_db(df)
+class SaveConflictError(Exception):
+    """Raised when rows changed on the server after they were loaded for editing"""
+
+def save_changes(supabase, upserts, deletes, expected_versions, table_name='reviewer_metrics_prod'):
+    """Write an edit set to a table, refusing it if any touched row changed meanwhile.
+
+    `expected_versions` maps each MS_Number to the row_hash of the row as it
+    was loaded. MS_Numbers missing from it are new rows and must not exist on
+    the server yet. Returns (saved, deleted, failures), where failures are
+    the upsert report entries of the records that could not be written.
+    """
+    touched = {record['MS_Number'] for record in upserts} | set(deletes)
+
+    # Compare the server's current rows against what the editor started from
+    current_versions = {}
+    for page in fetch_pages_for(supabase, table_name, touched):
+        for record in page:
+            current_versions[record['MS_Number']] = row_hash(record)
+
+    conflicts = sorted(
+        ms_number for ms_number in touched
+        if current_versions.get(ms_number) != expected_versions.get(ms_number)
+    )
+    if conflicts:
+        raise SaveConflictError(
+            f"{len(conflicts)} row(s) were changed by someone else since they were loaded: "
+            + ", ".join(conflicts)
+        )
+
+    saved, failures = 0, []
+    if upserts:
+        report = upsert_in_batches(supabase, table_name, upserts)
+        saved = report['written']
+        failures = [result for result in report['results'] if result['status'] == 'failed']
+
+    deletes = list(deletes)
+    for i in range(0, len(deletes), LOOKUP_CHUNK_SIZE):
+        supabase.table(table_name).delete().in_('MS_Number', deletes[i:i + LOOKUP_CHUNK_SIZE]).execute()
+
+    return saved, len(deletes), failures
+
+def run_sync(full=False, server_side=False, dry_run=False):
+    """Run one sync: promote new reviewer_metrics rows, write back prod and refresh the snapshot.
+
+    Returns the run summary of Supabase calls, also written to SYNC_SUMMARY_PATH.
+    """
+    start_run()
+    if server_side:
+        promote_on_server(full=full, dry_run=dry_run)
+    else:
+        df = get_local_data(full=full)
+        save_to_db(df, force=full)
+
+    manifest = refresh_snapshot(get_client())
+    print(f"Snapshot v{manifest['version']} is current with {manifest['rows']} rows")
+
+    summary = write_run_summary(SYNC_SUMMARY_PATH)
+    print(f"\n{summary['calls']} Supabase calls, {summary['errors']} errors, {summary['retries']} retries; "
+          f"summary written to {SYNC_SUMMARY_PATH}")
+    return summary
 
 if __name__ == "__main__":
+    from cli import main
     main()
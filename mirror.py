@@ -0,0 +1,249 @@
+import os
+import re
+import duckdb
+import pandas as pd
+from datetime import datetime, timedelta, timezone
+from sync_state import row_hash
+from analytics import create_summary_tables, update_summaries, summary_frames
+
+# Local DuckDB copy of reviewer_metrics_prod that the app reads from
+MIRROR_PATH = os.getenv(
+    "MIRROR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reviewer_metrics_mirror.duckdb")
+)
+
+# Column of reviewer_metrics_prod bumped on every insert or update, see
+# sql/reviewer_metrics_prod_updated_at.sql
+CHANGE_COLUMN = os.getenv("MIRROR_CHANGE_COLUMN", "updated_at")
+
+# Seconds before the newest mirrored change that every refresh pulls again.
+# Change stamps are taken when a transaction starts, so a write committing
+# after a refresh can carry an older stamp than rows already mirrored; this
+# should exceed the longest write transaction
+MIRROR_LOOKBACK_SECONDS = int(os.getenv("MIRROR_LOOKBACK_SECONDS", "300"))
+
+MIRROR_COLUMNS = [
+    'MS_Number',
+    'Name',
+    'Version',
+    'Year',
+    'Editor',
+    'Journal',
+    'Date_Invited',
+    'Date_Completed',
+]
+
+class MirrorBusyError(Exception):
+    """The mirror file is locked by another connection, such as a running sync"""
+
+def connect_mirror(path=MIRROR_PATH, read_only=False):
+    """Open the mirror database, creating its tables on first use.
+
+    A read-only connection does not block other readers. Raises
+    MirrorBusyError while another process, or a connection of another mode
+    in this one, holds the file.
+    """
+    if read_only and not os.path.exists(path):
+        connect_mirror(path).close()
+    try:
+        con = duckdb.connect(path, read_only=read_only)
+    except (duckdb.IOException, duckdb.ConnectionException) as e:
+        if isinstance(e, duckdb.IOException) and 'lock' not in str(e):
+            raise
+        raise MirrorBusyError(f"The local mirror is in use: {e}") from e
+    if read_only:
+        return con
+    con.execute(f"""
+    CREATE TABLE IF NOT EXISTS reviewer_metrics_prod (
+        MS_Number VARCHAR PRIMARY KEY,
+        Name VARCHAR,
+        Version VARCHAR,
+        Year INTEGER,
+        Editor VARCHAR,
+        Journal VARCHAR,
+        Date_Invited DATE,
+        Date_Completed DATE,
+        row_hash VARCHAR,
+        {CHANGE_COLUMN} VARCHAR
+    )
+    """)
+    create_summary_tables(con)
+    return con
+
+def parse_change_marker(marker):
+    """Parse a change column value as an aware datetime, reading naive ones as UTC"""
+    # fromisoformat before Python 3.11 takes only 3 or 6 fractional digits
+    text = re.sub(r'\.(\d+)', lambda m: '.' + (m.group(1) + '000000')[:6], marker.replace('Z', '+00:00'), count=1)
+    parsed = datetime.fromisoformat(text)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def _upsert_page(con, page):
+    # Keep the hash of the row exactly as the server returned it, so edits
+    # made from the mirror can still be checked for conflicts
+    rows = pd.DataFrame([
+        {
+            **{column: record.get(column) for column in MIRROR_COLUMNS},
+            'row_hash': row_hash(record),
+            CHANGE_COLUMN: record.get(CHANGE_COLUMN),
+        }
+        for record in page
+    ])
+    con.register('page_rows', rows)
+    con.execute(f"""
+    CREATE OR REPLACE TEMP TABLE page_clean AS
+    SELECT
+        CAST(MS_Number AS VARCHAR) AS MS_Number,
+        CAST(Name AS VARCHAR) AS Name,
+        CAST(Version AS VARCHAR) AS Version,
+        TRY_CAST(regexp_extract(CAST(Year AS VARCHAR), '\\d{{4}}') AS INTEGER) AS Year,
+        CAST(Editor AS VARCHAR) AS Editor,
+        CAST(Journal AS VARCHAR) AS Journal,
+        CAST(TRY_CAST(Date_Invited AS TIMESTAMP) AS DATE) AS Date_Invited,
+        CAST(TRY_CAST(Date_Completed AS TIMESTAMP) AS DATE) AS Date_Completed,
+        row_hash,
+        CAST({CHANGE_COLUMN} AS VARCHAR) AS {CHANGE_COLUMN}
+    FROM page_rows
+    """)
+    con.unregister('page_rows')
+    changed = con.execute("""
+    SELECT count(*) FROM page_clean p
+    ANTI JOIN reviewer_metrics_prod m ON m.MS_Number = p.MS_Number AND m.row_hash = p.row_hash
+    """).fetchone()[0]
+
+    # Swap the old versions of these rows for the new ones in the summaries
+    con.begin()
+    update_summaries(con, -1, """
+        SELECT * FROM reviewer_metrics_prod
+        WHERE MS_Number IN (SELECT MS_Number FROM page_clean)
+    """)
+    con.execute("INSERT OR REPLACE INTO reviewer_metrics_prod SELECT * FROM page_clean")
+    update_summaries(con, 1, "SELECT * FROM page_clean")
+    con.commit()
+    con.execute("DROP TABLE page_clean")
+    return changed
+
+def _delete_rows(con, where_sql):
+    # Delete mirror rows and take them out of the summaries in one transaction
+    con.begin()
+    update_summaries(con, -1, f"SELECT * FROM reviewer_metrics_prod WHERE {where_sql}")
+    removed = con.execute(f"DELETE FROM reviewer_metrics_prod WHERE {where_sql}").fetchone()[0]
+    con.commit()
+    return removed
+
+def _delete_keys(con, ms_numbers):
+    con.register('removed_keys', pd.DataFrame({'MS_Number': list(ms_numbers)}, dtype=object))
+    removed = _delete_rows(con, "MS_Number IN (SELECT MS_Number FROM removed_keys)")
+    con.unregister('removed_keys')
+    return removed
+
+def _prune_deleted(con, supabase):
+    from main import fetch_pages
+
+    # Drop mirror rows whose MS_Number no longer exists on the server
+    server_keys = []
+    for page in fetch_pages(supabase, 'reviewer_metrics_prod', columns=('MS_Number',)):
+        server_keys.extend(record['MS_Number'] for record in page)
+    con.register('server_keys', pd.DataFrame({'MS_Number': server_keys}, dtype=object))
+    removed = _delete_rows(con, "MS_Number NOT IN (SELECT MS_Number FROM server_keys)")
+    con.unregister('server_keys')
+    return removed
+
+def _key_differences(con, supabase):
+    """Return the MS_Numbers missing from the mirror and those no longer on the server.
+
+    They are found by key checksum; returns None when the functions in
+    sql/reconcile_checksums.sql cannot be called.
+    """
+    from postgrest.exceptions import APIError
+    from reconcile import ServerTable, MirrorTable, reconcile_tables
+
+    try:
+        result = reconcile_tables(ServerTable(supabase, 'reviewer_metrics_prod'), MirrorTable(con), compare_rows=False)
+    except APIError as e:
+        print(f"Could not compare key checksums, falling back to row counts: {e.message}")
+        return None
+    return result['missing'], result['extra']
+
+def refresh_mirror(supabase, path=MIRROR_PATH, full=False, lookback=MIRROR_LOOKBACK_SECONDS):
+    """Pull rows changed on the server since the last refresh into the mirror.
+
+    Rows whose change column is at or after the newest one already mirrored,
+    less `lookback` seconds for writes that commit out of order, are fetched.
+    The row counts and MS_Number checksums of each md5 bucket are then
+    compared with the server's (one call while the keys match): rows missing
+    from the mirror are pulled and rows gone from the server removed, so a
+    delete balanced by an insert is still caught. Without the functions in
+    sql/reconcile_checksums.sql only the row counts are compared, and such
+    deletes are left to --reconcile. A full refresh scans the server's whole
+    key list. Returns the number of mirror rows added, changed or removed.
+    """
+    # Imported here so reading the mirror does not load the sync code
+    from main import fetch_pages, fetch_pages_for, count_rows
+
+    with connect_mirror(path) as con:
+        marker = None
+        if not full:
+            marker = con.execute(f"SELECT max({CHANGE_COLUMN}) FROM reviewer_metrics_prod").fetchone()[0]
+
+        # gte so rows sharing the oldest stamp in the window are not missed;
+        # re-pulling unchanged rows is harmless
+        filters = []
+        if marker is not None:
+            since = parse_change_marker(marker) - timedelta(seconds=lookback)
+            filters = [('gte', CHANGE_COLUMN, since.isoformat())]
+
+        pulled = changed = 0
+        for page in fetch_pages(supabase, 'reviewer_metrics_prod', filters=filters):
+            changed += _upsert_page(con, page)
+            pulled += len(page)
+
+        differences = None if full else _key_differences(con, supabase)
+        if differences is not None:
+            missing, deleted = differences
+            for page in fetch_pages_for(supabase, 'reviewer_metrics_prod', missing):
+                changed += _upsert_page(con, page)
+                pulled += len(page)
+            removed = _delete_keys(con, deleted) if deleted else 0
+        else:
+            mirror_count = con.execute("SELECT count(*) FROM reviewer_metrics_prod").fetchone()[0]
+            removed = 0
+            if full or mirror_count != count_rows(supabase, 'reviewer_metrics_prod'):
+                removed = _prune_deleted(con, supabase)
+        if removed:
+            print(f"Removed {removed} deleted rows from the mirror")
+
+    print(f"Pulled {pulled} rows into the mirror, {changed} of them new or changed")
+    return changed + removed
+
+def repair_mirror(supabase, pull, remove, path=MIRROR_PATH):
+    """Re-pull the rows with MS_Numbers in pull from the server and delete those in remove"""
+    from main import fetch_pages_for
+
+    with connect_mirror(path) as con:
+        for page in fetch_pages_for(supabase, 'reviewer_metrics_prod', pull):
+            _upsert_page(con, page)
+        remove = list(remove)
+        if remove:
+            _delete_keys(con, remove)
+
+def load_mirror(path=MIRROR_PATH):
+    """Return the mirrored table as a DataFrame plus each row's server row_hash"""
+    with connect_mirror(path, read_only=True) as con:
+        df = con.execute("""
+        SELECT * EXCLUDE (row_hash) FROM reviewer_metrics_prod
+        ORDER BY Year DESC NULLS LAST
+        """).fetchdf()
+        row_versions = dict(con.execute("SELECT MS_Number, row_hash FROM reviewer_metrics_prod").fetchall())
+    return df, row_versions
+
+def delete_from_mirror(ms_numbers, path=MIRROR_PATH):
+    """Remove rows from the mirror after they were deleted on the server"""
+    ms_numbers = list(ms_numbers)
+    if not ms_numbers:
+        return
+    with connect_mirror(path) as con:
+        _delete_keys(con, ms_numbers)
+
+def load_analytics(path=MIRROR_PATH):
+    """Return the Analytics tab figures from the mirror's summary tables"""
+    with connect_mirror(path, read_only=True) as con:
+        return summary_frames(con)
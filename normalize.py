@@ -0,0 +1,55 @@
+import pandas as pd
+
+# Date format used by the Date_Invited and Date_Completed columns in Supabase
+DATE_FORMAT = '%Y-%m-%d'
+
+DATE_COLUMNS = ['Date_Invited', 'Date_Completed']
+
+# Low-cardinality text columns stored as categoricals
+CATEGORY_COLUMNS = ['Editor', 'Journal', 'Version']
+
+# Manuscript number as it appears in file names and email subjects, e.g.
+# JRNL-D-24-00123R1: journal, number and revision
+MS_NUMBER_PATTERN = r'([A-Za-z]+)-D-(\d{2}-\d{5})(R\d+)'
+
+def extract_ms_number(texts):
+    """Return the first manuscript number found in each text, or NA"""
+    parts = texts.astype('string').str.extract(MS_NUMBER_PATTERN)
+    return parts[0] + '-D-' + parts[1] + parts[2]
+
+def clean_year(years):
+    """Return years as nullable Int16, taking the first 4-digit run from text values"""
+    if pd.api.types.is_numeric_dtype(years):
+        return pd.to_numeric(years, errors='coerce').round().astype('Int16')
+    digits = years.astype('string').str.extract(r'(\d{4})', expand=False)
+    return pd.to_numeric(digits, errors='coerce').astype('Int16')
+
+def parse_dates(dates, date_format=DATE_FORMAT):
+    """Parse date strings with an explicit format; anything unparseable becomes NaT"""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    return pd.to_datetime(dates, format=date_format, exact=False, errors='coerce')
+
+def normalize_frame(df):
+    """Clean reviewer_metrics columns in place and give them compact dtypes.
+
+    Year becomes Int16, the date columns datetime64, and Editor, Journal
+    and Version categoricals. Missing values stay as pandas nulls; use
+    to_records to turn them into None for Supabase.
+    """
+    if 'Year' in df.columns:
+        df['Year'] = clean_year(df['Year'])
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = parse_dates(df[column])
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+def to_records(df):
+    """Convert a frame to JSON-ready record dicts, with None for every kind of null"""
+    out = df.astype(object)
+    for column in df.columns[[pd.api.types.is_datetime64_any_dtype(dtype) for dtype in df.dtypes]]:
+        out[column] = df[column].dt.strftime(DATE_FORMAT)
+    return out.where(df.notna(), None).to_dict('records')
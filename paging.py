@@ -0,0 +1,114 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import duckdb
+
+# Rows shown per page in the app tables
+PAGE_SIZE = int(os.getenv("APP_PAGE_SIZE", "100"))
+PAGE_SIZES = sorted({25, 50, 100, 250, 500, PAGE_SIZE})
+
+# Pages kept in memory per process, prefetched ones included
+PAGE_CACHE_SIZE = int(os.getenv("APP_PAGE_CACHE_SIZE", "64"))
+
+PAGE_COLUMNS = [
+    'MS_Number',
+    'Name',
+    'Version',
+    'Year',
+    'Editor',
+    'Journal',
+    'Date_Invited',
+    'Date_Completed',
+]
+
+FILTER_COLUMNS = ['Editor', 'Journal', 'Year']
+
+def _where(filters, ms_numbers):
+    clauses, params = [], []
+    for column, value in filters:
+        if column not in PAGE_COLUMNS:
+            raise ValueError(f"Cannot filter on {column}")
+        clauses.append(f'"{column}" = ?')
+        params.append(value)
+    if ms_numbers is not None:
+        clauses.append("MS_Number IN (SELECT unnest(?::VARCHAR[]))")
+        params.append(list(ms_numbers))
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+def page_query(path, page, page_size, sort='Year', descending=True, filters=(), ms_numbers=None):
+    """Read one page of the Parquet file at path, sorted and filtered in DuckDB.
+
+    Pages are numbered from 0. `filters` is a list of (column, value)
+    equality filters and `ms_numbers` optionally limits the rows to those
+    keys. Returns (rows, total) where total counts every matching row.
+    """
+    if sort not in PAGE_COLUMNS:
+        raise ValueError(f"Cannot sort on {sort}")
+    where, params = _where(filters, ms_numbers)
+    columns = ', '.join(PAGE_COLUMNS)
+    with duckdb.connect() as con:
+        rows = con.execute(f"""
+        SELECT {columns}, count(*) OVER () AS total_rows
+        FROM read_parquet(?)
+        {where}
+        ORDER BY {sort} {'DESC' if descending else 'ASC'} NULLS LAST, MS_Number
+        LIMIT ? OFFSET ?
+        """, [path, *params, page_size, page * page_size]).fetchdf()
+        if rows.empty:
+            total = con.execute(f"SELECT count(*) FROM read_parquet(?) {where}", [path, *params]).fetchone()[0]
+        else:
+            total = int(rows['total_rows'].iloc[0])
+    return rows.drop(columns=['total_rows']), total
+
+def filter_options(path):
+    """Return the distinct values of each filter column, for the filter pickers"""
+    with duckdb.connect() as con:
+        return {
+            column: [row[0] for row in con.execute(
+                f"SELECT DISTINCT {column} FROM read_parquet(?) WHERE {column} IS NOT NULL ORDER BY 1",
+                [path]
+            ).fetchall()]
+            for column in FILTER_COLUMNS
+        }
+
+class PageReader:
+    """Serves table pages from a small cache and prefetches the page after each one read.
+
+    The cache is keyed by file path, so a new snapshot version never serves
+    stale pages.
+    """
+
+    def __init__(self, cache_size=PAGE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.pages = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+    def _future(self, key):
+        with self.lock:
+            if key in self.pages:
+                self.pages.move_to_end(key)
+                return self.pages[key]
+            path, page, page_size, sort, descending, filters, ms_numbers = key
+            future = self.executor.submit(page_query, path, page, page_size, sort, descending, filters, ms_numbers)
+            self.pages[key] = future
+            while len(self.pages) > self.cache_size:
+                self.pages.popitem(last=False)
+            return future
+
+    def page(self, path, page, page_size=PAGE_SIZE, sort='Year', descending=True, filters=(), ms_numbers=None):
+        """Return (rows, total) like page_query, starting a fetch of the next page in the background"""
+        filters = tuple(sorted(filters))
+        ms_numbers = None if ms_numbers is None else tuple(sorted(ms_numbers))
+        key = (path, page, page_size, sort, descending, filters, ms_numbers)
+        try:
+            rows, total = self._future(key).result()
+        except Exception:
+            # Do not keep serving a failed read
+            with self.lock:
+                self.pages.pop(key, None)
+            raise
+        if (page + 1) * page_size < total:
+            self._future((path, page + 1, *key[2:]))
+        return rows.copy(), total
@@ -0,0 +1,172 @@
+import os
+from mirror import MIRROR_PATH, connect_mirror, repair_mirror
+
+# Buckets holding at most this many rows on either side are compared row by row
+RECONCILE_LEAF_ROWS = int(os.getenv("RECONCILE_LEAF_ROWS", "500"))
+
+# Hex digits of md5(MS_Number) after which a bucket is compared row by row
+# whatever its size
+RECONCILE_MAX_DEPTH = int(os.getenv("RECONCILE_MAX_DEPTH", "6"))
+
+# The row text of sql/reconcile_checksums.sql, built from the mirror's columns
+MIRROR_ROW_TEXT = """concat_ws(chr(31),
+    MS_Number,
+    coalesce(Name, '\\N'),
+    coalesce(Version, '\\N'),
+    coalesce(CAST(Year AS VARCHAR), '\\N'),
+    coalesce(Editor, '\\N'),
+    coalesce(Journal, '\\N'),
+    coalesce(CAST(Date_Invited AS VARCHAR), '\\N'),
+    coalesce(CAST(Date_Completed AS VARCHAR), '\\N')
+)"""
+
+EMPTY_BUCKET = (0, 0, 0)
+
+class ServerTable:
+    """Checksums of a Supabase table, from the functions in sql/reconcile_checksums.sql"""
+
+    def __init__(self, supabase, table_name):
+        self.supabase = supabase
+        self.name = table_name
+
+    def buckets(self, prefix):
+        rows = self.supabase.rpc('reconcile_buckets', {'table_name': self.name, 'prefix': prefix}).execute().data
+        return {
+            row['bucket']: (row['row_count'], int(row['key_sum']), int(row['row_sum'] or 0))
+            for row in rows
+        }
+
+    def rows(self, prefix):
+        rows = self.supabase.rpc('reconcile_rows', {'table_name': self.name, 'prefix': prefix}).execute().data
+        return {row['MS_Number']: row['row_md5'] for row in rows}
+
+class MirrorTable:
+    """The same checksums computed over the local DuckDB mirror"""
+
+    name = 'mirror'
+
+    def __init__(self, con):
+        self.con = con
+
+    def _hashes(self):
+        return f"""
+        SELECT MS_Number, md5(MS_Number) AS key_md5, md5({MIRROR_ROW_TEXT}) AS row_md5
+        FROM reviewer_metrics_prod
+        """
+
+    def buckets(self, prefix):
+        rows = self.con.execute(f"""
+        SELECT
+            substr(key_md5, 1, ?),
+            count(*),
+            sum(('0x' || substr(key_md5, 1, 15))::BIGINT),
+            sum(('0x' || substr(row_md5, 1, 15))::BIGINT)
+        FROM ({self._hashes()})
+        WHERE starts_with(key_md5, ?)
+        GROUP BY 1
+        """, [len(prefix) + 1, prefix]).fetchall()
+        return {bucket: (count, int(key_sum), int(row_sum)) for bucket, count, key_sum, row_sum in rows}
+
+    def rows(self, prefix):
+        return dict(self.con.execute(
+            f"SELECT MS_Number, row_md5 FROM ({self._hashes()}) WHERE starts_with(key_md5, ?)", [prefix]
+        ).fetchall())
+
+def differing_buckets(left, right, compare_rows=True, leaf_rows=RECONCILE_LEAF_ROWS, max_depth=RECONCILE_MAX_DEPTH):
+    """Return the md5 prefixes of the buckets where left and right disagree, and the bucket calls made.
+
+    Starting from the 16 one-digit buckets, every bucket whose row count and
+    checksums match is settled at once; the others are split into their 16
+    sub-buckets until they hold at most leaf_rows rows or reach max_depth
+    digits. Without compare_rows only the MS_Numbers are compared.
+    """
+    width = 3 if compare_rows else 2
+    differing, pending, calls = [], [''], 0
+    while pending:
+        prefix = pending.pop()
+        left_buckets, right_buckets = left.buckets(prefix), right.buckets(prefix)
+        calls += 1
+        for bucket in sorted(set(left_buckets) | set(right_buckets)):
+            left_sums = left_buckets.get(bucket, EMPTY_BUCKET)
+            right_sums = right_buckets.get(bucket, EMPTY_BUCKET)
+            if left_sums[:width] == right_sums[:width]:
+                continue
+            if max(left_sums[0], right_sums[0]) <= leaf_rows or len(bucket) >= max_depth:
+                differing.append(bucket)
+            else:
+                pending.append(bucket)
+    return differing, calls
+
+def reconcile_tables(left, right, compare_rows=True):
+    """Compare two tables by checksum and list the MS_Numbers that differ.
+
+    Returns a dict with 'missing' (in left but not right), 'extra' (in right
+    but not left) and, with compare_rows, 'changed' (in both with different
+    contents), plus the buckets narrowed down to.
+    """
+    buckets, calls = differing_buckets(left, right, compare_rows)
+    missing, extra, changed = [], [], []
+    for bucket in buckets:
+        left_rows, right_rows = left.rows(bucket), right.rows(bucket)
+        missing.extend(ms_number for ms_number in left_rows if ms_number not in right_rows)
+        extra.extend(ms_number for ms_number in right_rows if ms_number not in left_rows)
+        if compare_rows:
+            changed.extend(
+                ms_number for ms_number, digest in left_rows.items()
+                if ms_number in right_rows and right_rows[ms_number] != digest
+            )
+    return {
+        'left': left.name,
+        'right': right.name,
+        'bucket_calls': calls,
+        'differing_buckets': buckets,
+        'missing': sorted(missing),
+        'extra': sorted(extra),
+        'changed': sorted(changed),
+    }
+
+def _print_result(result, missing_label, extra_label):
+    print(f"{result['left']} vs {result['right']}: {len(result['differing_buckets'])} differing buckets "
+          f"found in {result['bucket_calls']} checksum calls")
+    for label, key in ((missing_label, 'missing'), (extra_label, 'extra'), ('changed', 'changed')):
+        if result[key]:
+            shown = ', '.join(result[key][:10]) + (' ...' if len(result[key]) > 10 else '')
+            print(f"  {len(result[key])} {label}: {shown}")
+
+def run_reconcile(supabase=None, repair=False, mirror_path=MIRROR_PATH):
+    """Check reviewer_metrics against reviewer_metrics_prod, and prod against the mirror.
+
+    Only the keys of reviewer_metrics are compared, since prod holds cleaned
+    copies of its rows. With repair, MS_Numbers missing from prod are
+    promoted, and mirror rows that are missing, changed or deleted on the
+    server are pulled again or removed, after which a new snapshot is
+    written. MS_Numbers only found in prod are reported but never removed.
+    Returns both comparison results.
+    """
+    # Imported here so the checksum code can run against a mirror alone
+    from supabase_client import get_client
+    from main import promote_ms_numbers
+    from snapshot import write_snapshot
+
+    supabase = supabase or get_client()
+    source = ServerTable(supabase, 'reviewer_metrics')
+    prod = ServerTable(supabase, 'reviewer_metrics_prod')
+
+    print("\nComparing reviewer_metrics with reviewer_metrics_prod...")
+    promotion = reconcile_tables(source, prod, compare_rows=False)
+    _print_result(promotion, 'not promoted', 'only in prod')
+    if repair and promotion['missing']:
+        report = promote_ms_numbers(supabase, promotion['missing'])
+        print(f"Promoted {report['written']} missing records with {len(report['failed'])} errors")
+
+    print("\nComparing reviewer_metrics_prod with the mirror...")
+    with connect_mirror(mirror_path) as con:
+        mirror = reconcile_tables(prod, MirrorTable(con))
+    _print_result(mirror, 'missing from the mirror', 'deleted on the server')
+    stale = mirror['missing'] + mirror['changed']
+    if repair and (stale or mirror['extra']):
+        repair_mirror(supabase, stale, mirror['extra'], mirror_path)
+        print(f"Pulled {len(stale)} rows into the mirror and removed {len(mirror['extra'])}")
+        write_snapshot(mirror_path=mirror_path)
+
+    return {'promotion': promotion, 'mirror': mirror}
@@ -1,6 +1,12 @@
+import os
+import sys
+import argparse
 import duckdb
 import pandas as pd
 
+# Make the top-level modules importable when run from the scripts folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
 def check_metrics_db():
     # Connect to the metrics database
     conn = duckdb.connect('metrics.duckdb')
@@ -23,5 +29,33 @@ def check_metrics_db():
     # Close the connection
     conn.close()
 
+def check_snapshot(columns=None, offline=False):
+    from snapshot import read_manifest, refresh_snapshot, load_snapshot
+
+    if not offline:
+        from supabase_client import get_client
+        try:
+            refresh_snapshot(get_client())
+        except Exception as e:
+            print(f"Could not check Supabase for changes, using the local snapshot: {e}")
+
+    df = load_snapshot(columns)
+    manifest = read_manifest()
+    print(f"\nSnapshot v{manifest['version']} ({manifest['file']}), written {manifest['written']}")
+    print(f"Rows: {manifest['rows']}, newest change: {manifest['marker']}")
+    print("\nColumns:")
+    print(df.dtypes)
+    print("\nContents:")
+    print(df)
+
 if __name__ == "__main__":
-    check_metrics_db()
+    parser = argparse.ArgumentParser(description="Inspect metrics.duckdb or the reviewer_metrics_prod snapshot")
+    parser.add_argument("--snapshot", action="store_true", help="show the Parquet snapshot of reviewer_metrics_prod instead")
+    parser.add_argument("--columns", nargs='+', help="with --snapshot, only read these columns")
+    parser.add_argument("--offline", action="store_true", help="with --snapshot, do not check Supabase for changes")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        check_snapshot(args.columns, args.offline)
+    else:
+        check_metrics_db()
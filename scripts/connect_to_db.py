@@ -1,32 +1,69 @@
 import re
 import os
+import sys
+import argparse
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-from supabase import create_client
+
+# Make the top-level modules importable when run from the scripts folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from supabase_client import get_client
+from main import upsert_in_batches, count_rows
+from sync_state import load_sync_state, save_sync_state
+from normalize import MS_NUMBER_PATTERN
 
 # Load environment variables
 load_dotenv()
 
-def import_data():
-    folder_path = '../Dealt With/'
-    pattern = r'([A-Za-z]+)-D-(\d{2}-\d{5})(R\d+)\s\((.*?)\)\s(\d{4})-(\d{2})-(\d{2})\.pdf'
-    files = os.listdir(folder_path)
+# Remembers the size and mtime of every file already scanned, keyed by name
+MANIFEST_PATH = os.getenv("DEALT_WITH_MANIFEST", "dealt_with_manifest.json")
+
+FILE_PATTERN = re.compile(MS_NUMBER_PATTERN + r'\s\((.*?)\)\s(\d{4})-(\d{2})-(\d{2})\.pdf')
+
+def parse_file_name(file_name):
+    """Return the reviewer_metrics record for a file name, or None if it doesn't match"""
+    match = FILE_PATTERN.search(file_name)
+    if not match:
+        return None
+    return {
+        'Name': file_name,
+        'MS_Number': f"{match.group(1)}-D-{match.group(2)}{match.group(3)}",
+        'Version': match.group(3),
+        'Year': int(match.group(5)),
+        'Editor': match.group(4),
+        'Journal': match.group(1)
+    }
+
+def scan_folder(folder_path, manifest):
+    """Parse only the files that are new or changed since the manifest was written.
+
+    Returns the parsed records and the updated manifest entries for those files.
+    """
     file_data = []
-
-    for file_name in files:
-        file_path = os.path.join(folder_path, file_name)
-        if os.path.isfile(file_path):  # Ensure it's a file, not a directory
-            match = re.search(pattern, file_name)
-            if match:
-                file_data.append({
-                    'Name': file_name,
-                    'MS_Number': f"{match.group(1)}-D-{match.group(2)}{match.group(3)}",
-                    'Version': match.group(3),
-                    'Year': int(match.group(5)),
-                    'Editor': match.group(4),
-                    'Journal': match.group(1)
-                })
+    scanned = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if not entry.is_file():  # Ensure it's a file, not a directory
+                continue
+            stat = entry.stat()
+            signature = [stat.st_size, stat.st_mtime_ns]
+            if manifest.get(entry.name) == signature:
+                continue
+
+            scanned[entry.name] = signature
+            record = parse_file_name(entry.name)
+            if record:
+                file_data.append(record)
+
+    return file_data, scanned
+
+def import_data(rescan=False):
+    folder_path = '../Dealt With/'
+    manifest = {} if rescan else load_sync_state(MANIFEST_PATH)
+    file_data, scanned = scan_folder(folder_path, manifest)
+    print(f"Scanned {len(scanned)} new or changed files ({len(manifest)} already seen)")
 
     if file_data:
         df = pd.DataFrame(file_data)
@@ -49,51 +86,45 @@ def import_data():
         print(f"After deduplication: {len(df)} unique records")
 
         try:
-            # Initialize Supabase client
-            supabase = create_client(
-                os.getenv("SUPABASE_URL"),
-                os.getenv("SUPABASE_KEY")
+            # Get the shared Supabase client
+            supabase = get_client()
+
+            # Insert everything in bulk and let the database skip MS_Numbers
+            # that already exist, instead of checking each one first
+            records = df.to_dict('records')
+            print(f"Adding {len(records)} records, skipping any already in the database...")
+            report = upsert_in_batches(
+                supabase, 'reviewer_metrics', records,
+                on_conflict='MS_Number', ignore_duplicates=True
             )
+            print(f"Sent {report['written']} records in {report['elapsed_s']:.2f}s "
+                  f"with {len(report['failed'])} errors and {report['retries']} retries")
 
-            # Get all existing MS_Numbers from the database
-            print("Fetching existing MS_Numbers from database...")
-            existing = supabase.table('reviewer_metrics').select('MS_Number').execute()
-            existing_ms_numbers = [record['MS_Number'] for record in existing.data]
-            print(f"Found {len(existing_ms_numbers)} existing MS_Numbers in database")
-
-            # Find MS_Numbers that are missing from the database
-            missing_records = df[~df['MS_Number'].isin(existing_ms_numbers)]
-            print(f"Found {len(missing_records)} MS_Numbers that need to be added")
-
-            # Insert only the missing records
-            if not missing_records.empty:
-                print("Adding missing records...")
-                for _, record in missing_records.iterrows():
-                    try:
-                        # Double-check if the record exists before inserting
-                        check = supabase.table('reviewer_metrics').select('MS_Number').eq('MS_Number', record['MS_Number']).execute()
-                        if not check.data:
-                            response = supabase.table('reviewer_metrics').insert(
-                                record.to_dict()
-                            ).execute()
-                            print(f"Added: {record['MS_Number']}")
-                    except Exception as e:
-                        if "duplicate key" not in str(e):
-                            print(f"Error adding record {record['MS_Number']}: {str(e)}")
-            else:
-                print("No missing records found - all MS_Numbers are already in the database")
+            # Only remember files whose records reached the database, so
+            # failures are retried on the next run
+            failed_names = {record['Name'] for record in report['failed']}
+            manifest.update({
+                name: signature for name, signature in scanned.items()
+                if name not in failed_names
+            })
 
             # Verify total records in database
-            result = supabase.table('reviewer_metrics').select("*").execute()
-            print(f"Total records in database: {len(result.data)}")
+            print(f"Total records in database: {count_rows(supabase, 'reviewer_metrics')}")
 
         except Exception as e:
             print(f"Error connecting to Supabase: {str(e)}")
     else:
-        print("No matching files found.")
+        print("No new matching files found.")
+        manifest.update(scanned)
+
+    save_sync_state(manifest, MANIFEST_PATH)
 
 def main():
-    import_data()
+    parser = argparse.ArgumentParser(description="Add manuscripts from the Dealt With folder to reviewer_metrics")
+    parser.add_argument("--rescan", action="store_true", help="ignore the manifest and parse every file again")
+    args = parser.parse_args()
+
+    import_data(rescan=args.rescan)
 
 if __name__ == "__main__":
     main()
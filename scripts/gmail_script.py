@@ -1,11 +1,44 @@
 import re
+import os
+import sys
+import threading
 import pandas as pd
-from simplegmail import Gmail
-from simplegmail.query import construct_query
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
+# Make the top-level modules importable when run from the scripts folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-gmail = Gmail()
-labels = gmail.list_labels()
+from sync_state import load_sync_state, save_sync_state
+from normalize import extract_ms_number, DATE_COLUMNS, DATE_FORMAT
+from main import fetch_pages_for, upsert_in_batches, SERVER_MANAGED_COLUMNS
+from supabase_client import get_client
+
+# Append-only local stores of ingested messages. Their Id columns double as
+# the cache of messages that have already been fetched.
+SENT_STORE = 'gmail_sent.csv'
+REPLY_STORE = 'gmail_replies.csv'
+
+# Remembers when each kind of message was last synced
+CHECKPOINT_PATH = 'gmail_sync_state.json'
+
+# Pairs of invites and completions matched by MS_Number and reviewer
+MATCHED_OUTPUT = 'cleaned_gmail_data.csv'
+
+# Number of messages fetched from Gmail at the same time
+MAX_WORKERS = int(os.getenv("GMAIL_MAX_WORKERS", "8"))
+
+_gmail = None
+_thread_local = threading.local()
+
+def get_gmail():
+    """Return the shared Gmail client, signing in on first use"""
+    global _gmail
+    if _gmail is None:
+        # Imported here so the matching code can be used without Gmail access
+        from simplegmail import Gmail
+        _gmail = Gmail()
+    return _gmail
 
 def clean_email(email):
     """ Remove extra quotes around email addresses, including Name <email> format """
@@ -17,61 +50,194 @@ def clean_email(email):
     
     return email
 
-def get_replies():
+def list_message_ids(query):
+    """Return the ids of every message matching a query, without fetching bodies"""
+    message_ids = []
+    page_token = None
+    while True:
+        response = get_gmail().service.users().messages().list(
+            userId='me', q=query, pageToken=page_token
+        ).execute()
+        message_ids.extend(message['id'] for message in response.get('messages', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return message_ids
+
+def fetch_message(message_id):
+    # The Gmail API client is not thread-safe, so each worker thread builds its own
+    if not hasattr(_thread_local, 'gmail'):
+        from simplegmail import Gmail
+        _thread_local.gmail = Gmail(_creds=get_gmail().creds)
+    return _thread_local.gmail._build_message_from_ref('me', {'id': message_id}, attachments='ignore')
+
+def load_seen_ids(store_path):
+    if not os.path.exists(store_path):
+        return set()
+    return set(pd.read_csv(store_path, usecols=['Id'], dtype=str)['Id'])
+
+def ingest_messages(query_params, store_path, checkpoint_key, to_row, full=False):
+    """Fetch messages not yet in the local store and append them to it.
+
+    Only messages since the last checkpoint are listed, and ids already in the
+    store are skipped, so each run fetches just what is new. Returns the rows
+    that were added.
+    """
+    from simplegmail.query import construct_query
+
+    state = load_sync_state(CHECKPOINT_PATH)
+    started = datetime.now()
+
+    if not full and checkpoint_key in state:
+        # Gmail's after: filter works in whole days, so step back a day and
+        # let the id cache drop what was already fetched
+        after = datetime.fromisoformat(state[checkpoint_key]) - timedelta(days=1)
+        query_params = {**query_params, "after": after.strftime('%Y/%m/%d')}
+
+    seen_ids = set() if full else load_seen_ids(store_path)
+    new_ids = [
+        message_id for message_id in list_message_ids(construct_query(query_params))
+        if message_id not in seen_ids
+    ]
+    print(f"Found {len(new_ids)} new messages for {checkpoint_key}")
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        rows = [to_row(message) for message in pool.map(fetch_message, new_ids)]
+
+    if rows:
+        write_header = full or not os.path.exists(store_path)
+        pd.DataFrame(rows).to_csv(store_path, mode='w' if full else 'a', header=write_header, index=False)
+
+    state[checkpoint_key] = started.isoformat()
+    save_sync_state(state, CHECKPOINT_PATH)
+    return rows
+
+def get_replies(full=False):
     # Get Replies
     query_params = {
-        #"after": '2024/12/10',
         "labels": ["review_submitted"]
     }
 
-    reply_messages = gmail.get_messages(query=construct_query(query_params))
-    reply_dict = []
-    for message in reply_messages:
-        message_info = {
+    def to_row(message):
+        return {
+            'Id': message.id,
             'To': clean_email(message.recipient),  # Clean the recipient email
             'From': clean_email(message.sender),   # Clean the sender email
             'Subject': clean_email(message.subject),
             'Date Completed': message.date
         }
 
-        reply_dict.append(message_info)
+    # Return the newly added rows
+    return ingest_messages(query_params, REPLY_STORE, 'replies', to_row, full=full)
 
-    # Return the list to be converted to a DataFrame later
-    return reply_dict
-
-def get_sent():
+def get_sent(full=False):
     # Get Sent Emails
     sent_query_messages = {
-        #"after": '2024/12/10',
         "sender": ['']
     }
-    sent_messages = gmail.get_messages(query=construct_query(sent_query_messages))
-    sent_dict = []
-    for message in sent_messages:
-        message_info = {
+
+    def to_row(message):
+        return {
+            'Id': message.id,
             'To': clean_email(message.recipient),  # Clean the recipient email
             'From': clean_email(message.sender),   # Clean the sender email
             'Subject': message.subject,
             'Date Invited': message.date
         }
 
-        sent_dict.append(message_info)
+    # Return the newly added rows
+    return ingest_messages(sent_query_messages, SENT_STORE, 'sent', to_row, full=full)
+
+def parse_message_dates(dates):
+    # Message dates carry their own UTC offsets; compare them in UTC and
+    # report them as local calendar dates
+    return pd.to_datetime(dates, utc=True, format='ISO8601', errors='coerce').dt.tz_convert(
+        datetime.now().astimezone().tzinfo
+    )
+
+def match_invites_and_replies(sent_df, reply_df):
+    """Pair invites with completions on (MS_Number, reviewer address).
+
+    The MS number is taken from the subject, so reply prefixes and forwarded
+    subjects still match. Each pair gets its earliest invite and the first
+    reply at or after it; pairs without a reply keep a null Date_Completed.
+    With no invites the result is empty.
+    """
+    keys = ['MS_Number', 'Reviewer']
+    invites = pd.DataFrame({
+        'MS_Number': extract_ms_number(sent_df['Subject']),
+        'Reviewer': sent_df['To'].str.strip().str.lower(),
+        'Date_Invited': parse_message_dates(sent_df['Date Invited']),
+    }).dropna()
+    # Grouping hashes each (MS_Number, Reviewer) pair into a single row
+    invites = invites.groupby(keys, as_index=False)['Date_Invited'].min()
+
+    replies = pd.DataFrame({
+        'MS_Number': extract_ms_number(reply_df['Subject']),
+        'Reviewer': reply_df['From'].str.strip().str.lower(),
+        'Date_Completed': parse_message_dates(reply_df['Date Completed']),
+    }).dropna()
+    replies = replies.merge(invites, on=keys)
+    replies = replies[replies['Date_Completed'] >= replies['Date_Invited']]
+    completions = replies.groupby(keys, as_index=False)['Date_Completed'].min()
 
-    # Return the list to be converted to a DataFrame later
-    return sent_dict
+    return invites.merge(completions, on=keys, how='left')
 
-def format_gmail_data():
-    # Get the data from both functions and create the DataFrames
-    df_a = pd.DataFrame(get_sent())
-    df_b = pd.DataFrame(get_replies())
+def update_prod_dates(matches, overwrite=False):
+    """Bulk-fill Date_Invited and Date_Completed in reviewer_metrics_prod.
 
-    # Check if 'To', 'From', and 'Subject' exist in both dataframes before merging
+    Each manuscript gets its first invite and first completion across all
+    reviewers. Dates already set in prod are kept unless overwrite is True.
+    Returns the number of rows updated.
+    """
+    per_ms = matches.groupby('MS_Number').agg(
+        Date_Invited=('Date_Invited', 'min'),
+        Date_Completed=('Date_Completed', 'min')
+    )
+    found = {
+        column: per_ms[column].dt.strftime(DATE_FORMAT).where(per_ms[column].notna(), None).to_dict()
+        for column in DATE_COLUMNS
+    }
+
+    supabase = get_client()
+    records = []
+    for page in fetch_pages_for(supabase, 'reviewer_metrics_prod', per_ms.index):
+        for record in page:
+            updated = {key: value for key, value in record.items() if key not in SERVER_MANAGED_COLUMNS}
+            for column in DATE_COLUMNS:
+                new_value = found[column].get(record['MS_Number'])
+                if new_value and (overwrite or not updated.get(column)):
+                    updated[column] = new_value
+            if any(updated.get(column) != record.get(column) for column in DATE_COLUMNS):
+                records.append(updated)
+
+    print(f"Matched {len(per_ms)} manuscripts, {len(records)} need their dates updated")
+    if not records:
+        return 0
+
+    # Whole rows are sent so the upsert never has to fill in other columns
+    report = upsert_in_batches(
+        supabase, 'reviewer_metrics_prod', records, on_conflict='MS_Number'
+    )
+    print(f"Updated {report['written']} rows with {len(report['failed'])} errors")
+    return report['written']
+
+def format_gmail_data(full=False, overwrite=False):
+    # Bring both local stores up to date, then build the DataFrames from them
+    get_sent(full=full)
+    get_replies(full=full)
+    df_a = pd.read_csv(SENT_STORE, dtype=str) if os.path.exists(SENT_STORE) else pd.DataFrame()
+    df_b = pd.read_csv(REPLY_STORE, dtype=str) if os.path.exists(REPLY_STORE) else pd.DataFrame()
+
+    # Check if 'To', 'From', and 'Subject' exist in both dataframes before matching
     if all(col in df_a.columns for col in ['To', 'From', 'Subject']) and all(col in df_b.columns for col in ['To', 'From', 'Subject']):
-        # Perform the merge
-        merged_df = pd.merge(df_a, df_b, on=['Subject'], how='left')
-        # Save the merged dataframe to CSV
-        merged_df.to_csv("cleaned_gmail_data.csv", index=False)
-        print("Merged data saved to cleaned_gmail_data.csv")
+        matches = match_invites_and_replies(df_a, df_b)
+        # Save the matched pairs to CSV
+        matches.to_csv(MATCHED_OUTPUT, index=False)
+        print(f"Matched {len(matches)} invite/reviewer pairs, saved to {MATCHED_OUTPUT}")
+
+        update_prod_dates(matches, overwrite=overwrite)
     else:
         print("One or more required columns are missing from the dataframes")
 
+if __name__ == "__main__":
+    format_gmail_data()
@@ -0,0 +1,163 @@
+import os
+import time
+import argparse
+import tempfile
+import duckdb
+
+# Memory DuckDB may use for the join before spilling to disk
+MERGE_MEMORY_LIMIT = os.getenv("MERGE_MEMORY_LIMIT", "1GB")
+
+# Key types: any DuckDB type, or YEAR for the first 4-digit run of the text
+# (the rule clean_year uses). Keys without a type are trimmed text.
+DEFAULT_KEY_TYPES = {'Year': 'YEAR'}
+
+JOINS = {'inner': 'INNER', 'left': 'LEFT', 'right': 'RIGHT', 'outer': 'FULL', 'full': 'FULL'}
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _source(path):
+    """SQL reading a CSV or Parquet file; CSV columns are read as text so no sample can mistype them"""
+    escaped = path.replace("'", "''")
+    if path.lower().endswith('.parquet'):
+        return f"read_parquet('{escaped}')"
+    return f"read_csv('{escaped}', header=true, all_varchar=true)"
+
+def _key_expression(column, key_type):
+    text = f"nullif(trim(CAST({_quote(column)} AS VARCHAR)), '')"
+    if key_type == 'VARCHAR':
+        return text
+    if key_type == 'YEAR':
+        return f"TRY_CAST(regexp_extract({text}, '\\d{{4}}') AS INTEGER)"
+    return f"TRY_CAST({text} AS {key_type})"
+
+def parse_keys(specs):
+    """Turn 'column' or 'column:TYPE' specs into (column, type) pairs"""
+    keys = []
+    for spec in specs:
+        column, _, key_type = spec.rpartition(':') if ':' in spec else (spec, '', '')
+        keys.append((column, (key_type or DEFAULT_KEY_TYPES.get(column, 'VARCHAR')).upper()))
+    return keys
+
+def _side(con, path, keys, drop, dedupe, order_by):
+    """Return (sql, non-key columns) for one input with typed keys and the dedupe rule applied"""
+    source = _source(path)
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    key_columns = [column for column, _ in keys]
+    missing = [column for column in key_columns if column not in columns]
+    if missing:
+        raise ValueError(f"{path} has no column {', '.join(missing)}")
+    others = [column for column in columns if column not in key_columns and column not in drop]
+
+    select = ', '.join(
+        [f"{_key_expression(column, key_type)} AS {_quote(column)}" for column, key_type in keys]
+        + [_quote(column) for column in others]
+    )
+    sql = f"SELECT {select} FROM {source}"
+    if dedupe != 'none':
+        if dedupe != 'any' and order_by not in columns:
+            raise ValueError(f"{path} has no column {order_by} to pick the {dedupe} row by")
+        partition = ', '.join(_quote(column) for column in key_columns)
+        order = '' if dedupe == 'any' else (
+            f" ORDER BY {_quote(order_by)} {'DESC' if dedupe == 'last' else 'ASC'} NULLS LAST"
+        )
+        sql = f"SELECT * FROM ({sql}) QUALIFY row_number() OVER (PARTITION BY {partition}{order}) = 1"
+    return sql, others
+
+def merge_files(left, right, output, keys, how='left', dedupe='none', order_by=None,
+                drop_left=(), drop_right=(), prefer=None, suffixes=('_x', '_y'), match_null_keys=True,
+                require=(), sort=None, descending=False, memory_limit=MERGE_MEMORY_LIMIT):
+    """Join two CSV or Parquet exports in DuckDB and stream the result to output.
+
+    `keys` are (column, type) pairs from parse_keys; each side's keys are
+    trimmed and cast the same way before joining, and with match_null_keys
+    missing keys match each other as they did in pandas. `dedupe` keeps one
+    row per key on each side: 'any', or the 'first' or 'last' by order_by.
+    Columns found on both sides keep both values with suffixes, unless
+    prefer is 'left' or 'right', which takes that side's value when it is
+    not null. Rows with a null in any of the `require` columns are dropped.
+    The join, dedupe and sort spill to a temporary folder past memory_limit,
+    and the output (CSV, or Parquet by extension) is written as it is
+    produced. Returns the number of rows written.
+    """
+    started = time.perf_counter()
+    key_columns = [column for column, _ in keys]
+    with tempfile.TemporaryDirectory(prefix='merge-') as temp_dir, duckdb.connect() as con:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+        con.execute(f"SET temp_directory = '{temp_dir}'")
+        if sort is None:
+            con.execute("SET preserve_insertion_order = false")
+
+        left_sql, left_columns = _side(con, left, keys, drop_left, dedupe, order_by)
+        right_sql, right_columns = _side(con, right, keys, drop_right, dedupe, order_by)
+
+        equals = 'IS NOT DISTINCT FROM' if match_null_keys else '='
+        condition = ' AND '.join(f"l.{_quote(column)} {equals} r.{_quote(column)}" for column in key_columns)
+        shared = set(left_columns) & set(right_columns)
+
+        select = [f"coalesce(l.{_quote(column)}, r.{_quote(column)}) AS {_quote(column)}" for column in key_columns]
+        for column in left_columns:
+            if column not in shared:
+                select.append(f"l.{_quote(column)}")
+            elif prefer == 'left':
+                select.append(f"coalesce(l.{_quote(column)}, r.{_quote(column)}) AS {_quote(column)}")
+            elif prefer == 'right':
+                select.append(f"coalesce(r.{_quote(column)}, l.{_quote(column)}) AS {_quote(column)}")
+            else:
+                select.append(f"l.{_quote(column)} AS {_quote(column + suffixes[0])}")
+        for column in right_columns:
+            if column not in shared:
+                select.append(f"r.{_quote(column)}")
+            elif prefer is None:
+                select.append(f"r.{_quote(column)} AS {_quote(column + suffixes[1])}")
+
+        query = f"""
+        SELECT {', '.join(select)}
+        FROM ({left_sql}) l
+        {JOINS[how]} JOIN ({right_sql}) r ON {condition}
+        """
+        if require:
+            query = f"SELECT * FROM ({query}) WHERE " + ' AND '.join(f"{_quote(column)} IS NOT NULL" for column in require)
+        if sort is not None:
+            query += f" ORDER BY {_quote(sort)} {'DESC' if descending else 'ASC'} NULLS LAST"
+
+        escaped = output.replace("'", "''")
+        options = "FORMAT parquet, COMPRESSION zstd" if output.lower().endswith('.parquet') else "FORMAT csv, HEADER"
+        rows = con.execute(f"COPY ({query}) TO '{escaped}' ({options})").fetchone()[0]
+
+    print(f"Wrote {rows} rows to {output} in {time.perf_counter() - started:.2f}s")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join two CSV or Parquet exports out of core with DuckDB")
+    parser.add_argument("left", help="left CSV or Parquet file")
+    parser.add_argument("right", help="right CSV or Parquet file")
+    parser.add_argument("-o", "--output", required=True, help="file to write; Parquet if it ends in .parquet, CSV otherwise")
+    parser.add_argument("--keys", nargs='+', required=True,
+                        help="join columns, optionally typed as column:TYPE (a DuckDB type, or YEAR); "
+                             "Year defaults to YEAR and the rest to trimmed text")
+    parser.add_argument("--how", choices=sorted(JOINS), default='left', help="join type")
+    parser.add_argument("--dedupe", choices=['none', 'any', 'first', 'last'], default='none',
+                        help="keep one row per key on each side before joining")
+    parser.add_argument("--order-by", help="with --dedupe first or last, the column deciding which row that is")
+    parser.add_argument("--drop-left", nargs='+', default=[], help="columns of the left file to leave out")
+    parser.add_argument("--drop-right", nargs='+', default=[], help="columns of the right file to leave out")
+    parser.add_argument("--prefer", choices=['left', 'right'],
+                        help="for columns in both files, take this side's value instead of keeping both")
+    parser.add_argument("--null-keys-differ", action="store_true", help="never match rows on a missing key")
+    parser.add_argument("--require", nargs='+', default=[], help="drop output rows missing any of these columns")
+    parser.add_argument("--sort", help="sort the output by this column")
+    parser.add_argument("--descending", action="store_true", help="with --sort, largest first")
+    parser.add_argument("--memory-limit", default=MERGE_MEMORY_LIMIT, help="DuckDB memory limit before spilling to disk")
+    args = parser.parse_args()
+
+    if args.dedupe in ('first', 'last') and not args.order_by:
+        parser.error(f"--dedupe {args.dedupe} needs --order-by")
+
+    merge_files(
+        args.left, args.right, args.output, parse_keys(args.keys),
+        how=args.how, dedupe=args.dedupe, order_by=args.order_by,
+        drop_left=args.drop_left, drop_right=args.drop_right, prefer=args.prefer,
+        match_null_keys=not args.null_keys_differ, require=args.require,
+        sort=args.sort, descending=args.descending, memory_limit=args.memory_limit
+    )
@@ -0,0 +1,157 @@
+import re
+import shlex
+import threading
+import pandas as pd
+from collections import defaultdict
+
+# Fields searched when a term has no field prefix
+DEFAULT_FIELDS = ['MS_Number', 'Name', 'Editor']
+
+# Prefixes accepted in field-scoped terms such as editor:smith
+FIELD_ALIASES = {
+    'ms': 'MS_Number',
+    'ms_number': 'MS_Number',
+    'name': 'Name',
+    'editor': 'Editor',
+    'journal': 'Journal',
+    'year': 'Year',
+    'version': 'Version',
+}
+
+GRAM_SIZE = 3
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+def _normalize(value):
+    if value is None or pd.isna(value):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).lower()
+
+def parse_query(query):
+    """Split a query into (field, term) pairs; field is None for unscoped terms"""
+    try:
+        parts = shlex.split(query)
+    except ValueError:
+        # Unbalanced quotes, treat the query as plain words
+        parts = query.split()
+
+    terms = []
+    for part in parts:
+        match = re.match(r'^(\w+):(.+)$', part)
+        if match and match.group(1).lower() in FIELD_ALIASES:
+            terms.append((FIELD_ALIASES[match.group(1).lower()], match.group(2).lower()))
+        else:
+            terms.append((None, part.lower()))
+    return terms
+
+class SearchIndex:
+    """Trigram index over the searchable columns of reviewer_metrics_prod.
+
+    Rows are keyed by MS_Number. Terms of three or more characters are looked
+    up through the trigram postings and then confirmed with a substring check
+    on the candidates, so results match a case-insensitive contains. Shorter
+    terms fall back to scanning the stored values.
+    """
+
+    def __init__(self, fields=tuple(FIELD_ALIASES.values())):
+        self.fields = list(dict.fromkeys(fields))
+        self.versions = {}
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._keys = []
+        self._values = []
+        self._free_ids = []
+        self._postings = {field: defaultdict(set) for field in self.fields}
+
+    def _add(self, key, record):
+        if self._free_ids:
+            row_id = self._free_ids.pop()
+        else:
+            row_id = len(self._keys)
+            self._keys.append(None)
+            self._values.append(None)
+
+        values = {field: _normalize(record.get(field)) for field in self.fields}
+        for field, value in values.items():
+            postings = self._postings[field]
+            for gram in _grams(value):
+                postings[gram].add(row_id)
+
+        self._ids[key] = row_id
+        self._keys[row_id] = key
+        self._values[row_id] = values
+
+    def _remove(self, key):
+        row_id = self._ids.pop(key)
+        for field, value in self._values[row_id].items():
+            postings = self._postings[field]
+            for gram in _grams(value):
+                postings[gram].discard(row_id)
+                if not postings[gram]:
+                    del postings[gram]
+
+        self._keys[row_id] = None
+        self._values[row_id] = None
+        self._free_ids.append(row_id)
+
+    def sync(self, df, row_versions):
+        """Bring the index in line with df, re-indexing only rows whose version changed"""
+        with self._lock:
+            if row_versions == self.versions:
+                return
+
+            removed = [key for key in self.versions if key not in row_versions]
+            changed = {
+                key for key, version in row_versions.items()
+                if self.versions.get(key) != version
+            }
+
+            for key in removed:
+                self._remove(key)
+
+            if changed:
+                columns = [field for field in self.fields if field in df.columns]
+                rows = df.loc[df['MS_Number'].isin(changed), columns]
+                for record in rows.to_dict('records'):
+                    key = record['MS_Number']
+                    if key in self._ids:
+                        self._remove(key)
+                    self._add(key, record)
+
+            self.versions = dict(row_versions)
+
+    def _match(self, field, term, candidates):
+        # Return the row ids among candidates (None means all) whose field contains term
+        if len(term) >= GRAM_SIZE:
+            postings = self._postings[field]
+            for gram in sorted(_grams(term), key=lambda g: len(postings.get(g, ()))):
+                found = postings.get(gram)
+                if not found:
+                    return set()
+                candidates = set(found) if candidates is None else candidates & found
+                if not candidates:
+                    return candidates
+            if len(term) == GRAM_SIZE:
+                # A single trigram hit is already an exact substring match
+                return candidates
+        elif candidates is None:
+            candidates = self._ids.values()
+
+        return {row_id for row_id in candidates if term in self._values[row_id][field]}
+
+    def search(self, query):
+        """Return the set of MS_Numbers matching every term in the query"""
+        with self._lock:
+            matches = None
+            for field, term in parse_query(query):
+                fields = [field] if field else [f for f in DEFAULT_FIELDS if f in self.fields]
+                term_matches = set()
+                for f in fields:
+                    term_matches |= self._match(f, term, matches)
+                matches = term_matches
+                if not matches:
+                    break
+            return {self._keys[row_id] for row_id in matches or ()}
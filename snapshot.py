@@ -0,0 +1,128 @@
+import os
+import glob
+from datetime import datetime, timedelta, timezone
+from sync_state import load_sync_state, save_sync_state
+from mirror import (MIRROR_PATH, CHANGE_COLUMN, MIRROR_LOOKBACK_SECONDS, connect_mirror, refresh_mirror,
+                    parse_change_marker)
+
+# Folder holding the Parquet snapshots of reviewer_metrics_prod
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+
+# Number of snapshot versions kept on disk; older ones are deleted
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+
+def manifest_path(snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, 'manifest.json')
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    """Return the manifest of the current snapshot, or None if there is none yet"""
+    manifest = load_sync_state(manifest_path(snapshot_dir))
+    if not manifest or not os.path.exists(os.path.join(snapshot_dir, manifest['file'])):
+        return None
+    return manifest
+
+def server_marker(supabase):
+    """Return the newest change marker and the row count of reviewer_metrics_prod in one request"""
+    response = (
+        supabase.table('reviewer_metrics_prod')
+        .select(CHANGE_COLUMN, count='exact')
+        .order(CHANGE_COLUMN, desc=True, nullsfirst=False)
+        .limit(1)
+        .execute()
+    )
+    marker = response.data[0][CHANGE_COLUMN] if response.data else None
+    return marker, response.count
+
+def is_stale(manifest, marker, count):
+    return manifest is None or manifest['marker'] != marker or manifest['rows'] != count
+
+def is_settled(manifest, lookback=MIRROR_LOOKBACK_SECONDS):
+    """Whether writes stamped before the snapshot's marker can no longer commit.
+
+    Such writes leave the marker and row count unchanged, so until the
+    snapshot has been checked `lookback` seconds after its marker the mirror
+    is refreshed again to pick them up.
+    """
+    if manifest['marker'] is None:
+        return True
+    checked = parse_change_marker(manifest.get('checked', manifest['written']))
+    return checked - parse_change_marker(manifest['marker']) >= timedelta(seconds=lookback)
+
+def write_snapshot(snapshot_dir=SNAPSHOT_DIR, mirror_path=MIRROR_PATH):
+    """Write the mirror to a new compressed Parquet snapshot version and return its manifest"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    previous = load_sync_state(manifest_path(snapshot_dir))
+    version = previous.get('version', 0) + 1
+    file_name = f"reviewer_metrics_prod_v{version:06d}.parquet"
+    temp_path = os.path.join(snapshot_dir, f"{file_name}.tmp")
+
+    with connect_mirror(mirror_path) as con:
+        marker, rows = con.execute(
+            f"SELECT max({CHANGE_COLUMN}), count(*) FROM reviewer_metrics_prod"
+        ).fetchone()
+        # Sorted the way the app shows it, so readers need not sort again
+        con.execute(f"""
+        COPY (SELECT * FROM reviewer_metrics_prod ORDER BY Year DESC NULLS LAST, MS_Number)
+        TO '{temp_path.replace("'", "''")}' (FORMAT parquet, COMPRESSION {SNAPSHOT_COMPRESSION})
+        """)
+    os.replace(temp_path, os.path.join(snapshot_dir, file_name))
+
+    manifest = {
+        'version': version,
+        'file': file_name,
+        'marker': marker,
+        'rows': rows,
+        'written': datetime.now(timezone.utc).isoformat(),
+    }
+    save_sync_state(manifest, manifest_path(snapshot_dir))
+
+    # Readers that opened an older version keep their memory map until they
+    # are done, so only versions beyond SNAPSHOT_KEEP are removed
+    versions = sorted(glob.glob(os.path.join(snapshot_dir, 'reviewer_metrics_prod_v*.parquet')))
+    for old in versions[:-SNAPSHOT_KEEP]:
+        os.remove(old)
+
+    print(f"Wrote snapshot v{version} with {rows} rows to {snapshot_dir}")
+    return manifest
+
+def refresh_snapshot(supabase, snapshot_dir=SNAPSHOT_DIR, mirror_path=MIRROR_PATH):
+    """Bring the snapshot up to date with the server, only if the server has changed.
+
+    One request reads the server's newest change marker and row count; the
+    mirror is refreshed when they differ from the current snapshot, or while
+    it is not settled yet. A new snapshot is written only if that changed
+    the mirror. Returns the current manifest.
+    """
+    manifest = read_manifest(snapshot_dir)
+    marker, count = server_marker(supabase)
+    stale = is_stale(manifest, marker, count)
+    if not stale and is_settled(manifest):
+        return manifest
+    if not refresh_mirror(supabase, mirror_path) and not stale:
+        # Nothing committed late; note the check so the snapshot can settle
+        manifest['checked'] = datetime.now(timezone.utc).isoformat()
+        save_sync_state(manifest, manifest_path(snapshot_dir))
+        return manifest
+    return write_snapshot(snapshot_dir, mirror_path)
+
+def snapshot_path(snapshot_dir=SNAPSHOT_DIR, mirror_path=MIRROR_PATH):
+    """Return the path of the current snapshot file, writing one from the mirror if there is none"""
+    manifest = read_manifest(snapshot_dir) or write_snapshot(snapshot_dir, mirror_path)
+    return os.path.join(snapshot_dir, manifest['file'])
+
+def load_snapshot(columns=None, snapshot_dir=SNAPSHOT_DIR, mirror_path=MIRROR_PATH):
+    """Read the current snapshot as a DataFrame without contacting the server.
+
+    The file is memory-mapped and only the requested columns are decoded.
+    If no snapshot exists yet, one is written from the local mirror first.
+    """
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(
+        snapshot_path(snapshot_dir, mirror_path),
+        columns=None if columns is None else list(columns),
+        memory_map=True
+    )
+    return table.to_pandas(date_as_object=False)
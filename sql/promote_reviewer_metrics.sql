@@ -0,0 +1,75 @@
+-- Promote new reviewer_metrics rows into reviewer_metrics_prod inside the
+-- database, so the sync only sends one RPC and reads back the counts
+-- (main.py --server-side). Run once in the Supabase SQL editor.
+--
+-- Applies the same rules as get_local_data: rows without an MS_Number are
+-- skipped, each MS_Number is promoted once (its most recently created row),
+-- Year keeps the first 4-digit run of its text, and MS_Numbers already in
+-- reviewer_metrics_prod are left untouched.
+--
+-- To try it against a local Postgres, create both tables with the same
+-- columns as in Supabase, load some rows, and run
+--     select promote_reviewer_metrics(dry_run => true);
+--     select promote_reviewer_metrics();
+-- The dry run reports the counts without writing anything.
+
+create or replace function promote_reviewer_metrics(
+    since timestamptz default null,
+    dry_run boolean default false
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    scanned bigint;
+    unique_rows bigint;
+    already_present bigint;
+    inserted bigint := 0;
+    high_water timestamptz;
+begin
+    select count(*), max(created_at)
+    into scanned, high_water
+    from reviewer_metrics
+    where since is null or created_at >= since;
+
+    drop table if exists promote_candidates;
+    create temporary table promote_candidates on commit drop as
+    select distinct on ("MS_Number")
+        "Name",
+        "MS_Number",
+        "Version",
+        substring("Year"::text from '\d{4}')::integer as "Year",
+        "Editor",
+        "Journal"
+    from reviewer_metrics
+    where "MS_Number" is not null
+      and (since is null or created_at >= since)
+    order by "MS_Number", created_at desc;
+    get diagnostics unique_rows = row_count;
+
+    select count(*)
+    into already_present
+    from promote_candidates c
+    where exists (
+        select 1 from reviewer_metrics_prod p where p."MS_Number" = c."MS_Number"
+    );
+
+    if not dry_run then
+        insert into reviewer_metrics_prod ("Name", "MS_Number", "Version", "Year", "Editor", "Journal")
+        select "Name", "MS_Number", "Version", "Year", "Editor", "Journal"
+        from promote_candidates
+        on conflict ("MS_Number") do nothing;
+        get diagnostics inserted = row_count;
+    end if;
+
+    return jsonb_build_object(
+        'scanned', scanned,
+        'unique', unique_rows,
+        'already_present', already_present,
+        'new', unique_rows - already_present,
+        'inserted', inserted,
+        'cursor', high_water,
+        'dry_run', dry_run
+    );
+end;
+$$;
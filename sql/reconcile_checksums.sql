@@ -0,0 +1,91 @@
+-- Checksums for reconciling reviewer_metrics, reviewer_metrics_prod and the
+-- local DuckDB mirror (reconcile.py, editorial-helper --reconcile). Run once
+-- in the Supabase SQL editor.
+--
+-- Rows are grouped into buckets by the leading hex digits of md5("MS_Number"),
+-- which every side computes the same way whatever its collation. For each
+-- bucket one row comes back with the row count and two sums: key_sum over the
+-- first 15 hex digits (60 bits) of each key's md5, and row_sum over the same
+-- digits of the md5 of the row's text. Sums do not depend on row order, so
+-- the client can compare them with the mirror's and narrow down into only the
+-- buckets that differ, reading their rows with reconcile_rows.
+--
+-- The row text joins MS_Number, Name, Version, Year, Editor, Journal,
+-- Date_Invited and Date_Completed with chr(31), writing nulls as \N and dates
+-- as their first 10 characters (YYYY-MM-DD). reconcile.py builds the same
+-- text in DuckDB. reviewer_metrics only gets key sums, once per distinct
+-- MS_Number, as its rows are not copied one for one.
+--
+-- To try it against a local Postgres, create both tables and run
+--     select * from reconcile_buckets('reviewer_metrics_prod');
+--     select * from reconcile_buckets('reviewer_metrics_prod', '3f');
+--     select * from reconcile_rows('reviewer_metrics_prod', '3f0');
+
+create or replace function reconcile_hashes(table_name text, prefix text default '')
+returns table (key_md5 text, row_md5 text, "MS_Number" text)
+language plpgsql
+stable
+as $$
+begin
+    -- The md5 range check rather than like lets the optional indexes below
+    -- serve deep prefixes
+    if table_name = 'reviewer_metrics' then
+        return query
+        select distinct md5(m."MS_Number"), null::text, m."MS_Number"::text
+        from reviewer_metrics m
+        where m."MS_Number" is not null
+          and md5(m."MS_Number") collate "C" >= prefix
+          and md5(m."MS_Number") collate "C" < prefix || 'g';
+    elsif table_name = 'reviewer_metrics_prod' then
+        return query
+        select
+            md5(p."MS_Number"),
+            md5(concat_ws(chr(31),
+                p."MS_Number",
+                coalesce(p."Name"::text, '\N'),
+                coalesce(p."Version"::text, '\N'),
+                coalesce(p."Year"::text, '\N'),
+                coalesce(p."Editor"::text, '\N'),
+                coalesce(p."Journal"::text, '\N'),
+                coalesce(left(p."Date_Invited"::text, 10), '\N'),
+                coalesce(left(p."Date_Completed"::text, 10), '\N')
+            )),
+            p."MS_Number"::text
+        from reviewer_metrics_prod p
+        where p."MS_Number" is not null
+          and md5(p."MS_Number") collate "C" >= prefix
+          and md5(p."MS_Number") collate "C" < prefix || 'g';
+    else
+        raise exception 'Cannot reconcile table %', table_name;
+    end if;
+end;
+$$;
+
+create or replace function reconcile_buckets(table_name text, prefix text default '')
+returns table (bucket text, row_count bigint, key_sum numeric, row_sum numeric)
+language sql
+stable
+as $$
+    select
+        left(h.key_md5, length(prefix) + 1),
+        count(*),
+        sum(('x' || left(h.key_md5, 15))::bit(60)::bigint),
+        sum(('x' || left(h.row_md5, 15))::bit(60)::bigint)
+    from reconcile_hashes(table_name, prefix) h
+    group by 1;
+$$;
+
+create or replace function reconcile_rows(table_name text, prefix text)
+returns table ("MS_Number" text, row_md5 text)
+language sql
+stable
+as $$
+    select h."MS_Number", h.row_md5
+    from reconcile_hashes(table_name, prefix) h;
+$$;
+
+-- Optional: lets the deeper, narrower calls skip most of the table
+create index if not exists reviewer_metrics_ms_number_md5
+    on reviewer_metrics ((md5("MS_Number") collate "C"));
+create index if not exists reviewer_metrics_prod_ms_number_md5
+    on reviewer_metrics_prod ((md5("MS_Number") collate "C"));
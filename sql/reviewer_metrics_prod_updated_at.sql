@@ -0,0 +1,30 @@
+-- Track when each reviewer_metrics_prod row last changed, so the local
+-- DuckDB mirror (mirror.py) can pull only rows modified since its last refresh.
+-- Run once in the Supabase SQL editor.
+--
+-- now() is the time the writing transaction started, not when it committed,
+-- so concurrent writes can become visible out of stamp order. The mirror
+-- therefore pulls again from MIRROR_LOOKBACK_SECONDS before its newest
+-- stamp on every refresh.
+
+alter table reviewer_metrics_prod
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$;
+
+drop trigger if exists reviewer_metrics_prod_set_updated_at on reviewer_metrics_prod;
+
+create trigger reviewer_metrics_prod_set_updated_at
+    before update on reviewer_metrics_prod
+    for each row execute function set_updated_at();
+
+create index if not exists reviewer_metrics_prod_updated_at_idx
+    on reviewer_metrics_prod (updated_at);
@@ -1,10 +1,31 @@
 import re
 import os
+import argparse
 import pandas as pd
 import duckdb
 from datetime import datetime
 
 
+METRICS_DB = 'metrics.duckdb'
+REVIEWS_DB = 'reviews.duckdb'
+
+METRICS_COLUMNS = """
+    Name STRING,
+    "MS Number" STRING PRIMARY KEY,
+    Version STRING,
+    Year INTEGER,
+    Editor STRING,
+    Journal STRING,
+    "Date Invited" DATE,
+    "Date Completed" DATE
+"""
+
+# Most recent first, matching the order the app shows
+SORTED_METRICS_QUERY = """
+SELECT * FROM reviewer_metrics
+ORDER BY Year DESC NULLS LAST, "Date Invited" DESC NULLS LAST
+"""
+
 def initialize_metrics_db():
     # Load the CSV file and ensure date columns are parsed correctly
     df = pd.read_csv('merged_file.csv', parse_dates=['Date Invited', 'Date Completed'])
@@ -14,34 +35,75 @@ def initialize_metrics_db():
     print(df.head())
 
     # Connect to DuckDB
-    con = duckdb.connect('metrics.duckdb')
+    con = duckdb.connect(METRICS_DB)
 
     # Drop the existing table if it exists
     con.execute("DROP TABLE IF EXISTS reviewer_metrics")
 
     # Create the table with the correct schema
+    con.execute(f"CREATE TABLE reviewer_metrics ({METRICS_COLUMNS})")
+
+    # Insert data into the table, keeping the first row for each MS Number
     con.execute("""
-    CREATE TABLE reviewer_metrics (
-        Name STRING,
-        "MS Number" STRING,
-        Version STRING,
-        Year INTEGER,
-        Editor STRING,
-        Journal STRING,
-        "Date Invited" DATE,
-        "Date Completed" DATE
-    )
+    INSERT INTO reviewer_metrics
+    SELECT * FROM df WHERE "MS Number" IS NOT NULL
+    ON CONFLICT DO NOTHING
     """)
 
-    # Insert data into the table
-    con.execute("INSERT INTO reviewer_metrics SELECT * FROM df")
-
     con.close()
     print("Data imported successfully into DuckDB.")
 
+def has_primary_key(con):
+    return con.execute("""
+    SELECT count(*) FROM duckdb_constraints()
+    WHERE table_name = 'reviewer_metrics' AND constraint_type = 'PRIMARY KEY'
+    """).fetchone()[0] > 0
+
+def add_primary_key():
+    """Rebuild reviewer_metrics with a primary key on "MS Number" if it lacks one.
+
+    Older databases may hold several rows per manuscript; the one kept is the
+    completed one if any, then the most recently invited. The old table is
+    kept as reviewer_metrics_legacy so no row is lost.
+    """
+    with duckdb.connect(METRICS_DB) as con:
+        if has_primary_key(con):
+            print("reviewer_metrics already has a primary key.")
+            return
+        legacy = con.execute(
+            "SELECT count(*) FROM duckdb_tables() WHERE table_name = 'reviewer_metrics_legacy'"
+        ).fetchone()[0]
+        if legacy:
+            print("reviewer_metrics_legacy already exists; rename or drop it before migrating again.")
+            return
+
+        con.execute("BEGIN TRANSACTION")
+        con.execute("ALTER TABLE reviewer_metrics RENAME TO reviewer_metrics_legacy")
+        con.execute(f"CREATE TABLE reviewer_metrics ({METRICS_COLUMNS})")
+        con.execute("""
+        INSERT INTO reviewer_metrics
+        SELECT * FROM reviewer_metrics_legacy
+        WHERE "MS Number" IS NOT NULL
+        QUALIFY row_number() OVER (
+            PARTITION BY "MS Number"
+            ORDER BY "Date Completed" IS NULL, "Date Invited" DESC NULLS LAST
+        ) = 1
+        """)
+        kept, distinct_rows, no_key = con.execute("""
+        SELECT
+            (SELECT count(*) FROM reviewer_metrics),
+            (SELECT count(*) FROM (SELECT DISTINCT * FROM reviewer_metrics_legacy WHERE "MS Number" IS NOT NULL)),
+            (SELECT count(*) FROM reviewer_metrics_legacy WHERE "MS Number" IS NULL)
+        """).fetchone()
+        con.execute("COMMIT")
+
+    print(f"Added a primary key on \"MS Number\" to reviewer_metrics, keeping {kept} rows.")
+    print(f"{distinct_rows - kept} distinct rows sharing an MS Number with a kept row and "
+          f"{no_key} rows without an MS Number were left out; all rows remain in reviewer_metrics_legacy.")
+
 def fetch_data():
     # Connect to DuckDB and fetch data
-    con = duckdb.connect('metrics.duckdb')
+    con = duckdb.connect(METRICS_DB)
     df = con.execute("SELECT * FROM reviewer_metrics").fetchdf()
     con.close()
 
@@ -59,7 +121,7 @@ def fetch_data():
 def get_local_data():
     """Get data from reviews database"""
     try:
-        with duckdb.connect('reviews.duckdb', read_only=True) as con:
+        with duckdb.connect(REVIEWS_DB, read_only=True) as con:
             df = con.execute("SELECT * FROM reviews").fetchdf()
             print("Data fetched successfully from reviews database.")
             return df
@@ -67,79 +129,62 @@ def get_local_data():
         print(f"Error fetching from reviews database: {e}")
         return pd.DataFrame()
 
-def check_for_new_data():
-    # Get both sets of data
-    reviews_df = get_local_data()
-    existing_df = fetch_data()
-
-    # Rename the column from 'MS_Number' to 'MS Number' in reviews_df
-    reviews_df = reviews_df.rename(columns={'MS_Number': 'MS Number'})
-
-    # Initialize new_man as an empty DataFrame with the same columns as reviews_df
-    new_man = pd.DataFrame(columns=reviews_df.columns)
-
-    # Get list of existing MS Numbers
-    existing_ms_numbers = existing_df['MS Number'].tolist() if not existing_df.empty else []
+# Rows in the reviews database whose MS_Number is not in reviewer_metrics yet
+NEW_REVIEWS_QUERY = """
+SELECT
+    r.Name,
+    r.MS_Number AS "MS Number",
+    r.Version,
+    r.Year,
+    r.Editor,
+    r.Journal,
+    r."Date Invited",
+    r."Date Completed"
+FROM reviews_db.reviews r
+ANTI JOIN reviewer_metrics m ON m."MS Number" = r.MS_Number
+WHERE r.MS_Number IS NOT NULL
+"""
+
+def attach_reviews(con):
+    con.execute(f"ATTACH IF NOT EXISTS '{REVIEWS_DB}' AS reviews_db (READ_ONLY)")
 
-    # Check for new entries
-    for index, row in reviews_df.iterrows():
-        ms_number = row['MS Number']
-        if ms_number not in existing_ms_numbers:
-            new_man = pd.concat([new_man, pd.DataFrame([row])], ignore_index=True)
-
-    return new_man
+def check_for_new_data():
+    """Return the reviews rows not yet in the metrics database"""
+    try:
+        with duckdb.connect(METRICS_DB, read_only=True) as con:
+            attach_reviews(con)
+            return con.execute(NEW_REVIEWS_QUERY).fetchdf()
+    except Exception as e:
+        print(f"Error checking for new data: {e}")
+        return pd.DataFrame()
 
 def format_data():
-    df = check_for_new_data()
-
-    if not df.empty:
-        new_df = pd.DataFrame(df)
-        # Convert None to NULL for DuckDB
-        new_df['Date Invited'] = pd.to_datetime(new_df['Date Invited'])
-        new_df['Date Completed'] = pd.to_datetime(new_df['Date Completed'])
-        new_df = new_df.sort_values(by='Year', ascending=False)
-
-        try:
-            # Save to metrics database with conflict handling
-            with duckdb.connect('metrics.duckdb') as con:
-                # Create temporary table for new data
-                con.execute("CREATE TEMP TABLE IF NOT EXISTS temp_metrics AS SELECT * FROM new_df")
-
-                # Insert data with conflict handling
-                con.execute("""
-                    INSERT INTO reviewer_metrics
-                    SELECT * FROM temp_metrics
-                    WHERE "MS Number" NOT IN (SELECT "MS Number" FROM reviewer_metrics)
-                """)
-
-                # Clean up temporary table
-                con.execute("DROP TABLE IF EXISTS temp_metrics")
-
-                # Fetch all data
-                existing_df = con.execute("SELECT * FROM reviewer_metrics").fetchdf()
-
-            # Combine new and existing data
-            complete_df = pd.concat([new_df, existing_df], ignore_index=True)
-            # Remove duplicates keeping the first occurrence (which will be from new_df)
-            complete_df = complete_df.drop_duplicates(subset='MS Number', keep='first')
-
-            # Sort the complete dataset by Year and Date Invited (most recent first)
-            complete_df['Date Invited'] = pd.to_datetime(complete_df['Date Invited'])
-            complete_df = complete_df.sort_values(by=['Year', 'Date Invited'],
-                                                ascending=[False, False])
-
-            print(f"Appended {len(new_df)} new rows")
-            return complete_df  # Return the sorted dataset with new entries at the top
-        except Exception as e:
-            print(f"Error inserting data: {e}")
-            return None
+    """Append new reviews to the metrics database and return every row, newest first"""
+    try:
+        with duckdb.connect(METRICS_DB) as con:
+            if not has_primary_key(con):
+                print("reviewer_metrics has no primary key yet; run main.py --add-primary-key first.")
+                return None
+            attach_reviews(con)
+
+            # The anti-join skips rows already stored; ON CONFLICT covers
+            # manuscripts listed more than once in the reviews database
+            appended = con.execute(f"""
+            INSERT INTO reviewer_metrics
+            {NEW_REVIEWS_QUERY}
+            ON CONFLICT DO NOTHING
+            """).fetchone()[0]
+
+            complete_df = con.execute(SORTED_METRICS_QUERY).fetchdf()
+    except Exception as e:
+        print(f"Error inserting data: {e}")
+        return None
+
+    if appended:
+        print(f"Appended {appended} new rows")
     else:
         print("No new rows to append.")
-        df = fetch_data()
-        # Sort existing data as well
-        df['Date Invited'] = pd.to_datetime(df['Date Invited'])
-        df = df.sort_values(by=['Year', 'Date Invited'], ascending=[False, False])
-        return df
+    return complete_df
 
 def main():
 
@@ -152,4 +197,12 @@ def main():
         print("No changes made to the data.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Append new reviews to the metrics database")
+    parser.add_argument("--add-primary-key", action="store_true",
+                        help="first migrate an older metrics database to one row per MS Number")
+    args = parser.parse_args()
+
+    if args.add_primary_key:
+        add_primary_key()
+    else:
+        main()
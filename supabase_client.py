@@ -0,0 +1,83 @@
+import os
+import threading
+from dotenv import load_dotenv
+from tracing import instrument
+
+# Load environment variables
+load_dotenv()
+
+# Seconds to wait on a single Supabase request
+TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
+# Maximum number of open HTTP connections shared by all callers
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+
+# Seconds an idle connection is kept open for reuse
+KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+
+_client = None
+_client_lock = threading.Lock()
+
+def _client_options():
+    from supabase import ClientOptions
+
+    return ClientOptions(
+        postgrest_client_timeout=TIMEOUT,
+        storage_client_timeout=TIMEOUT,
+        function_client_timeout=TIMEOUT,
+    )
+
+def _limit_pool(client):
+    """Give the client's PostgREST session a pool of POOL_SIZE connections.
+
+    supabase-py builds that session itself with httpx's default limits, and
+    rebuilds it whenever the auth token changes, so the builder is wrapped
+    to swap in a session with our limits each time.
+    """
+    import httpx
+
+    build = client._init_postgrest_client
+
+    def build_pooled(**kwargs):
+        postgrest = build(**kwargs)
+        session = postgrest.session
+        postgrest.session = type(session)(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            verify=postgrest.verify,
+            proxy=postgrest.proxy,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=POOL_SIZE,
+                max_keepalive_connections=POOL_SIZE,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            )
+        )
+        session.close()
+        return postgrest
+
+    client._init_postgrest_client = build_pooled
+    client._postgrest = None
+    return client
+
+def get_client():
+    """Return the process-wide Supabase client, creating it on first use.
+
+    The client is safe to share between threads and survives Streamlit
+    reruns, since this module is only imported once per process. Every
+    request it makes is recorded by tracing. The supabase package itself is
+    only imported here, so modules that merely import get_client stay cheap.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+                _client = instrument(_limit_pool(create_client(
+                    os.getenv("SUPABASE_URL"),
+                    os.getenv("SUPABASE_KEY"),
+                    options=_client_options()
+                )))
+    return _client
@@ -0,0 +1,130 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime, timezone
+
+# Folder holding one write-ahead journal per sync stage
+SYNC_JOURNAL_DIR = os.getenv("SYNC_JOURNAL_DIR", ".sync_journal")
+
+class SyncJournal:
+    """Write-ahead journal of the upsert batches of one sync stage.
+
+    begin() starts a run, plan() records each batch with its records
+    before it is handed to the writers, and ack() records each batch once
+    the server has confirmed it. finish() closes the run by removing the
+    journal. If a run dies part way, the next one finds it with open_run()
+    and sends only the planned batches that were never acknowledged.
+
+    The journal is a JSON lines file, started by begin() and then only
+    appended to, and synced to disk after each write, so a crash can at
+    worst leave a torn last line, which is ignored.
+    """
+
+    def __init__(self, stage, journal_dir=SYNC_JOURNAL_DIR):
+        self.stage = stage
+        self.path = os.path.join(journal_dir, f"{stage}.jsonl")
+        # Plans and acks are written from different threads of the pipeline
+        self.lock = threading.Lock()
+
+    def _append(self, entries, mode='a'):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, mode) as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=str) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self):
+        entries = []
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        # Torn write from a crash; nothing after it was acknowledged
+                        break
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def begin(self, table_name, options=None):
+        """Start a new run writing to table_name, replacing any earlier journal.
+
+        `options` are the upsert keyword arguments, kept so a resumed run
+        sends the batches the same way.
+        """
+        self._append([{
+            'type': 'begin',
+            'run': uuid.uuid4().hex,
+            'time': datetime.now(timezone.utc).isoformat(),
+            'table': table_name,
+            'options': options or {},
+        }], mode='w')
+
+    def plan(self, batches, meta=None):
+        """Record each (batch_id, records) pair as it passes through, then mark the plan complete.
+
+        `meta` is anything the caller needs to finish the run, such as the
+        cursor to save afterwards. It is read only once every batch has been
+        planned, so the stages producing the batches may fill it in as they go.
+        """
+        count = 0
+        for batch_id, chunk in batches:
+            self._append([{'type': 'plan', 'batch': batch_id, 'records': chunk}])
+            count += 1
+            yield batch_id, chunk
+        self._append([{'type': 'end', 'batches': count, 'meta': dict(meta or {})}])
+
+    def ack(self, batch_id, failed_records=()):
+        """Record that a batch was confirmed by the server, noting any records it rejected"""
+        self._append([{
+            'type': 'ack',
+            'batch': batch_id,
+            'failed': [record.get('MS_Number') for record in failed_records],
+        }])
+
+    def open_run(self):
+        """Return the interrupted run as a dict, or None if the last run finished.
+
+        The dict holds the begin entry's 'table' and 'options', every
+        planned batch under 'batches', the ids still to send under
+        'pending', and the MS_Numbers rejected so far under 'failed'.
+        'complete' says whether the whole plan was recorded, and 'meta' is
+        what plan() was given, or empty if the plan was cut short.
+        """
+        entries = self._read()
+        if not entries or entries[0].get('type') != 'begin':
+            return None
+        begin = entries[0]
+        batches = {}
+        acked = set()
+        failed = set()
+        end = None
+        for entry in entries[1:]:
+            if entry['type'] == 'plan':
+                batches[entry['batch']] = entry['records']
+            elif entry['type'] == 'ack':
+                acked.add(entry['batch'])
+                failed.update(entry['failed'])
+            elif entry['type'] == 'end':
+                end = entry
+        return {
+            'table': begin['table'],
+            'options': begin['options'],
+            'meta': end['meta'] if end else {},
+            'complete': end is not None,
+            'started': begin['time'],
+            'batches': batches,
+            'pending': [batch_id for batch_id in sorted(batches) if batch_id not in acked],
+            'failed': failed,
+        }
+
+    def finish(self):
+        """Close the run; the next begin() starts a new journal"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
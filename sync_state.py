@@ -0,0 +1,29 @@
+import os
+import json
+import hashlib
+
+# Local file that remembers sync progress between runs
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", ".sync_state.json")
+
+def load_sync_state(path=SYNC_STATE_PATH):
+    """Return the saved sync state, or an empty state if none exists yet"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Could not read sync state from {path}, starting fresh: {e}")
+        return {}
+
+def save_sync_state(state, path=SYNC_STATE_PATH):
+    """Write the sync state atomically so an interrupted run cannot corrupt it"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2, default=str)
+    os.replace(temp_path, path)
+
+def row_hash(record):
+    """Return a stable content hash for a record dict"""
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,50 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+
+from gmail_script import match_invites_and_replies
+
+SENT_COLUMNS = ['Id', 'To', 'From', 'Subject', 'Date Invited']
+REPLY_COLUMNS = ['Id', 'To', 'From', 'Subject', 'Date Completed']
+
+def sent(*rows):
+    return pd.DataFrame(list(rows), columns=SENT_COLUMNS, dtype=str)
+
+def replies(*rows):
+    return pd.DataFrame(list(rows), columns=REPLY_COLUMNS, dtype=str)
+
+INVITES = sent(
+    ['1', 'Reviewer@Example.com ', 'me@x.org', 'Invitation JRNL-D-24-00001R1', '2024-01-02T09:00:00+00:00'],
+    ['2', 'reviewer@example.com', 'me@x.org', 'Reminder JRNL-D-24-00001R1', '2024-01-05T09:00:00+00:00'],
+    ['3', 'other@example.com', 'me@x.org', 'Invitation ABCD-D-23-00042R2', '2024-02-01T09:00:00+00:00'],
+)
+
+def test_pairs_first_invite_with_first_reply_after_it():
+    matches = match_invites_and_replies(INVITES, replies(
+        ['4', 'me@x.org', 'reviewer@example.com', 'Re: JRNL-D-24-00001R1 review', '2024-01-01T09:00:00+00:00'],
+        ['5', 'me@x.org', 'reviewer@example.com', 'Fwd: Re: JRNL-D-24-00001R1', '2024-01-10T09:00:00+00:00'],
+        ['6', 'me@x.org', 'reviewer@example.com', 'Re: JRNL-D-24-00001R1', '2024-01-20T09:00:00+00:00'],
+    )).set_index(['MS_Number', 'Reviewer'])
+
+    assert len(matches) == 2
+    pair = matches.loc[('JRNL-D-24-00001R1', 'reviewer@example.com')]
+    assert pair['Date_Invited'].date().isoformat() == '2024-01-02'
+    assert pair['Date_Completed'].date().isoformat() == '2024-01-10'
+    assert pd.isna(matches.loc[('ABCD-D-23-00042R2', 'other@example.com'), 'Date_Completed'])
+
+def test_replies_without_ms_numbers_keep_invites_unmatched():
+    matches = match_invites_and_replies(INVITES, replies(
+        ['4', 'me@x.org', 'reviewer@example.com', 'Re: your invitation', '2024-01-10T09:00:00+00:00'],
+    ))
+
+    assert len(matches) == 2
+    assert matches['Date_Completed'].isna().all()
+
+def test_empty_inputs():
+    assert match_invites_and_replies(sent(), replies()).empty
+    assert match_invites_and_replies(sent(), replies(
+        ['4', 'me@x.org', 'reviewer@example.com', 'Re: JRNL-D-24-00001R1', '2024-01-10T09:00:00+00:00'],
+    )).empty
+    assert len(match_invites_and_replies(INVITES, replies())) == 2
@@ -1,6 +1,5 @@
-import os
 from dotenv import load_dotenv
-from supabase import create_client
+from supabase_client import get_client
 import pandas as pd
 
 # Load environment variables
@@ -8,11 +7,8 @@ load_dotenv()
 
 def test_connection():
     try:
-        # Initialize Supabase client
-        supabase = create_client(
-            os.getenv("SUPABASE_URL"),
-            os.getenv("SUPABASE_KEY")
-        )
+        # Get the shared Supabase client
+        supabase = get_client()
 
         print("Successfully connected to Supabase!")
 
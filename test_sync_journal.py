@@ -0,0 +1,130 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+
+import main
+import upsert_pipeline
+from sync_journal import SyncJournal
+from fake_postgrest import FakePostgrest, PostgrestError
+
+OPTIONS = {'on_conflict': 'MS_Number', 'ignore_duplicates': True}
+
+def source_row(ms_number):
+    return {'Name': f'Manuscript {ms_number}', 'MS_Number': ms_number, 'Version': 'R1',
+            'Year': '2024', 'Editor': 'Editor', 'Journal': 'JRNL'}
+
+def prod_record(ms_number):
+    return {'Name': f'Manuscript {ms_number}', 'MS_Number': ms_number, 'Version': 'R1',
+            'Year': 2024, 'Editor': 'Editor', 'Journal': 'JRNL'}
+
+def interrupted_run(journal, cursor='2024-01-01T00:00:00.000004+00:00', complete=True):
+    """Journal a promotion of MS-1..MS-4 in two batches where only the first was acknowledged"""
+    journal.begin('reviewer_metrics_prod', options=OPTIONS)
+    batches = journal.plan([(0, [prod_record('MS-1'), prod_record('MS-2')]),
+                            (1, [prod_record('MS-3'), prod_record('MS-4')])], meta={'cursor': cursor})
+    if complete:
+        list(batches)
+    else:
+        next(batches)
+        next(batches)
+    journal.ack(0)
+
+def test_torn_last_line_is_ignored(tmp_path):
+    journal = SyncJournal('promote', journal_dir=str(tmp_path))
+    interrupted_run(journal)
+    with open(journal.path, 'a') as f:
+        f.write('{"type": "ack", "batch": 1, "fai')
+
+    run = journal.open_run()
+
+    assert run['complete']
+    assert run['pending'] == [1]
+    assert run['meta'] == {'cursor': '2024-01-01T00:00:00.000004+00:00'}
+    assert run['options'] == OPTIONS
+
+def test_plan_cut_short_has_no_meta(tmp_path):
+    journal = SyncJournal('promote', journal_dir=str(tmp_path))
+    interrupted_run(journal, complete=False)
+
+    run = journal.open_run()
+
+    assert not run['complete']
+    assert run['meta'] == {}
+    assert run['pending'] == [1]
+
+def test_finished_run_is_not_resumed(tmp_path):
+    journal = SyncJournal('promote', journal_dir=str(tmp_path))
+    interrupted_run(journal)
+    journal.finish()
+
+    assert journal.open_run() is None
+
+@pytest.fixture
+def fake():
+    server = FakePostgrest().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def sync(fake, tmp_path, monkeypatch):
+    """Point get_local_data at the fake server, a journal in tmp_path and an in-memory sync state"""
+    from supabase import create_client
+
+    client = create_client(fake.url, 'bench.fake.key')
+    saved = []
+    monkeypatch.setattr(main, 'get_client', lambda: client)
+    monkeypatch.setattr(main, 'SyncJournal', lambda stage: SyncJournal(stage, journal_dir=str(tmp_path)))
+    monkeypatch.setattr(main, 'load_sync_state', lambda: {})
+    monkeypatch.setattr(main, 'save_sync_state', lambda state: saved.append(state['reviewer_metrics_cursor']))
+    monkeypatch.setattr(upsert_pipeline, 'BACKOFF_BASE', 0)
+
+    fake.table('reviewer_metrics').load([source_row(f'MS-{i}') for i in range(1, 5)])
+    prod = fake.table('reviewer_metrics_prod')
+    prod.load([prod_record('MS-1'), prod_record('MS-2')])
+    # MS-3 reached prod before the crash and was edited there since
+    prod.load([{**prod_record('MS-3'), 'Editor': 'Edited'}])
+    return SyncJournal('promote', journal_dir=str(tmp_path)), saved
+
+def test_resume_sends_only_pending_batches_insert_only(fake, sync):
+    journal, saved = sync
+    interrupted_run(journal)
+    fake.reset_stats()
+
+    main.get_local_data()
+
+    prod = fake.table('reviewer_metrics_prod').rows
+    # Only batch 1 is sent; the scan that follows finds nothing new
+    assert fake.stats['by_method']['POST'] == 1
+    assert sorted(prod) == ['MS-1', 'MS-2', 'MS-3', 'MS-4']
+    assert prod['MS-3']['Editor'] == 'Edited'
+    assert saved[0] == '2024-01-01T00:00:00.000004+00:00'
+    assert journal.open_run() is None
+
+def test_cursor_is_held_back_while_a_resumed_batch_fails(fake, sync, monkeypatch):
+    journal, saved = sync
+    interrupted_run(journal)
+    handle = fake.handle
+
+    def reject_ms_4(method, path, query, headers, body):
+        if method == 'POST' and any(record['MS_Number'] == 'MS-4' for record in body):
+            raise PostgrestError(400, '23514', 'new row violates check constraint')
+        return handle(method, path, query, headers, body)
+
+    monkeypatch.setattr(fake, 'handle', reject_ms_4)
+
+    main.get_local_data()
+
+    assert 'MS-4' not in fake.table('reviewer_metrics_prod').rows
+    assert saved == []
+
+def test_cursor_of_a_plan_cut_short_is_not_kept(fake, sync):
+    journal, saved = sync
+    interrupted_run(journal, cursor='9999-12-31T00:00:00+00:00', complete=False)
+
+    main.get_local_data()
+
+    # The full scan that follows sets the cursor from the rows it read
+    assert sorted(fake.table('reviewer_metrics_prod').rows) == ['MS-1', 'MS-2', 'MS-3', 'MS-4']
+    assert '9999-12-31T00:00:00+00:00' not in saved
@@ -0,0 +1,101 @@
+import os
+import sys
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench'))
+
+import upsert_pipeline
+from upsert_pipeline import is_transient, run_upserts
+from fake_postgrest import FakePostgrest, PostgrestError
+
+@pytest.fixture(scope='module')
+def fake():
+    server = FakePostgrest().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def supabase(fake, monkeypatch):
+    from supabase import create_client
+
+    fake.tables.clear()
+    fake.reset_stats()
+    monkeypatch.setattr(upsert_pipeline, 'BACKOFF_BASE', 0)
+    monkeypatch.setattr(upsert_pipeline, 'MAX_RETRIES', 2)
+    return create_client(fake.url, 'bench.fake.key')
+
+def fail_posts(fake, monkeypatch, error_for):
+    """Make POSTs fail with the PostgrestError error_for(records) returns, if any"""
+    handle = fake.handle
+
+    def failing(method, path, query, headers, body):
+        if method == 'POST':
+            error = error_for(body)
+            if error is not None:
+                raise error
+        return handle(method, path, query, headers, body)
+
+    monkeypatch.setattr(fake, 'handle', failing)
+
+def records(count):
+    return [{'MS_Number': f'MS-{i:03d}', 'Name': str(i)} for i in range(count)]
+
+@pytest.mark.parametrize('code, transient', [
+    ('503', True),
+    ('429', True),
+    ('409', False),
+    ('404', False),
+    ('40001', True),
+    ('40P01', True),
+    ('08006', True),
+    ('23505', False),
+    ('42501', False),
+    ('PGRST001', True),
+    ('PGRST116', False),
+])
+def test_is_transient_classifies_codes(code, transient):
+    assert is_transient(APIError({'code': code, 'message': 'error'})) is transient
+
+def test_is_transient_retries_transport_errors_only():
+    assert is_transient(httpx.ConnectError('refused'))
+    assert not is_transient(ValueError('bad value'))
+
+def test_permanent_error_is_bisected_to_the_bad_record(fake, supabase, monkeypatch):
+    fail_posts(fake, monkeypatch, lambda body: (
+        PostgrestError(409, '23505', 'duplicate key value violates unique constraint')
+        if any(record['MS_Number'] == 'MS-005' for record in body) else None
+    ))
+
+    report = run_upserts(supabase, 't', records(8), batch_size=8, concurrency=1)
+
+    assert report['written'] == 7
+    assert [record['MS_Number'] for record in report['failed']] == ['MS-005']
+    assert report['retries'] == 0
+    # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1
+    assert fake.stats['by_method']['POST'] == 7
+    assert sorted(fake.table('t').rows) == [f'MS-{i:03d}' for i in range(8) if i != 5]
+
+@pytest.mark.parametrize('status, code', [(503, '503'), (500, '40001')])
+def test_transient_error_is_retried(fake, supabase, monkeypatch, status, code):
+    failures = iter([PostgrestError(status, code, 'try again')])
+    fail_posts(fake, monkeypatch, lambda body: next(failures, None))
+
+    report = run_upserts(supabase, 't', records(4), batch_size=4, concurrency=1)
+
+    assert report['written'] == 4
+    assert report['retries'] == 1
+    assert {result['attempts'] for result in report['results']} == {2}
+    assert len(fake.table('t').rows) == 4
+
+def test_exhausted_retries_fail_the_batch_whole(fake, supabase, monkeypatch):
+    fail_posts(fake, monkeypatch, lambda body: PostgrestError(503, '503', 'Service Unavailable'))
+
+    report = run_upserts(supabase, 't', records(8), batch_size=4, concurrency=1)
+
+    assert report['written'] == 0
+    assert len(report['failed']) == 8
+    assert {result['attempts'] for result in report['results']} == {3}
+    # Two batches of three attempts each, none of them split
+    assert fake.stats['by_method']['POST'] == 6
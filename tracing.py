@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from collections import deque
+from datetime import datetime, timezone
+
+# JSON lines log with one entry per Supabase call, off unless a path is set
+TRACE_LOG_PATH = os.getenv("SUPABASE_TRACE_LOG", "")
+
+# Size at which the trace log is rotated, and how many old logs are kept
+TRACE_LOG_MAX_BYTES = int(os.getenv("SUPABASE_TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("SUPABASE_TRACE_LOG_BACKUPS", "3"))
+
+# Number of recent calls kept in memory for the Streamlit panel
+RECENT_CALLS = int(os.getenv("SUPABASE_TRACE_RECENT", "200"))
+
+recent_calls = deque(maxlen=RECENT_CALLS)
+
+_lock = threading.Lock()
+_run = {'started': None, 'calls': [], 'retries': 0}
+_log = {'logger': None}
+
+def _operation(request):
+    if request.method == 'GET':
+        return 'select'
+    if request.method == 'HEAD':
+        return 'count'
+    if request.method == 'PATCH':
+        return 'update'
+    if request.method == 'DELETE':
+        return 'delete'
+    if 'resolution=' in request.headers.get('prefer', ''):
+        return 'upsert'
+    return 'insert'
+
+def _row_count(request, response):
+    if request.method in ('GET', 'HEAD'):
+        # Content-Range looks like 0-999/* or */0
+        first, _, rest = response.headers.get('content-range', '').partition('/')
+        if '-' in first:
+            start, _, end = first.partition('-')
+            return int(end) - int(start) + 1
+        return 0
+    try:
+        body = json.loads(request.content or b'null')
+    except ValueError:
+        return None
+    return len(body) if isinstance(body, list) else 1
+
+def _on_request(request):
+    request.extensions = {**request.extensions, 'trace_started': time.perf_counter()}
+
+def _on_response(response):
+    # Read the body here so the latency covers the whole transfer
+    response.read()
+    request = response.request
+    latency = time.perf_counter() - request.extensions.get('trace_started', time.perf_counter())
+    path = request.url.path.rstrip('/')
+    table = path.split('/rest/v1/', 1)[-1]
+
+    record_call({
+        'time': datetime.now(timezone.utc).isoformat(),
+        'table': table,
+        'operation': _operation(request),
+        'status': response.status_code,
+        'outcome': 'ok' if response.is_success else 'error',
+        'latency_ms': round(latency * 1000, 2),
+        'rows': _row_count(request, response),
+        'request_bytes': len(request.content or b''),
+        'response_bytes': len(response.content),
+    })
+
+def _attach(session):
+    hooks = session.event_hooks
+    if _on_response in hooks['response']:
+        return
+    session.event_hooks = {
+        'request': hooks['request'] + [_on_request],
+        'response': hooks['response'] + [_on_response],
+    }
+
+def instrument(client):
+    """Attach the tracing hooks to the HTTP session behind a Supabase client.
+
+    supabase-py builds a new session whenever the auth token changes, so the
+    builder is wrapped to attach them to every session it makes.
+    """
+    build = client._init_postgrest_client
+    if getattr(build, 'traced', False):
+        return client
+
+    def build_traced(**kwargs):
+        postgrest = build(**kwargs)
+        _attach(postgrest.session)
+        return postgrest
+
+    build_traced.traced = True
+    client._init_postgrest_client = build_traced
+    client._postgrest = None
+    return client
+
+def _trace_logger():
+    # Opened on first use; None when the log is off or cannot be opened
+    with _lock:
+        if _log['logger'] is None and TRACE_LOG_PATH:
+            try:
+                handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES,
+                                              backupCount=TRACE_LOG_BACKUPS)
+            except OSError as e:
+                print(f"Could not write Supabase trace log: {e}")
+                handler = logging.NullHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger = logging.getLogger('editorial_helper.supabase_calls')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _log['logger'] = logger
+        return _log['logger']
+
+def record_call(entry):
+    recent_calls.append(entry)
+    with _lock:
+        if _run['started'] is not None:
+            _run['calls'].append(entry)
+    logger = _trace_logger()
+    if logger is not None:
+        logger.info(json.dumps(entry))
+
+def record_retry(table, rows):
+    """Note that a write to table is being retried with rows records"""
+    with _lock:
+        if _run['started'] is not None:
+            _run['retries'] += 1
+    record_call({
+        'time': datetime.now(timezone.utc).isoformat(),
+        'table': table,
+        'operation': 'retry',
+        'status': None,
+        'outcome': 'retry',
+        'latency_ms': 0.0,
+        'rows': rows,
+        'request_bytes': 0,
+        'response_bytes': 0,
+    })
+
+def start_run():
+    """Begin collecting calls for a sync run summary"""
+    with _lock:
+        _run['started'] = datetime.now(timezone.utc).isoformat()
+        _run['calls'] = []
+        _run['retries'] = 0
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def run_summary():
+    """Summarize the calls made since start_run, grouped by table and operation"""
+    with _lock:
+        calls = [call for call in _run['calls'] if call['operation'] != 'retry']
+        summary = {
+            'started': _run['started'],
+            'finished': datetime.now(timezone.utc).isoformat(),
+            'calls': len(calls),
+            'retries': _run['retries'],
+            'errors': sum(call['outcome'] == 'error' for call in calls),
+            'operations': [],
+        }
+
+    groups = {}
+    for call in calls:
+        groups.setdefault((call['table'], call['operation']), []).append(call)
+    for (table, operation), group in sorted(groups.items()):
+        latencies = [call['latency_ms'] for call in group]
+        summary['operations'].append({
+            'table': table,
+            'operation': operation,
+            'calls': len(group),
+            'errors': sum(call['outcome'] == 'error' for call in group),
+            'rows': sum(call['rows'] or 0 for call in group),
+            'request_bytes': sum(call['request_bytes'] for call in group),
+            'response_bytes': sum(call['response_bytes'] for call in group),
+            'latency_ms_total': round(sum(latencies), 2),
+            'latency_ms_p50': _percentile(latencies, 0.5),
+            'latency_ms_p95': _percentile(latencies, 0.95),
+            'latency_ms_max': max(latencies),
+        })
+    return summary
+
+def write_run_summary(path):
+    """Write run_summary() as JSON and return it"""
+    summary = run_summary()
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
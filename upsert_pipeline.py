@@ -0,0 +1,222 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from postgrest.exceptions import APIError
+from tracing import record_retry
+
+# Number of upsert requests allowed in flight at once
+WRITE_CONCURRENCY = int(os.getenv("SYNC_WRITE_CONCURRENCY", "4"))
+
+# Number of batches prepared ahead of the writers before the producer waits
+WRITE_QUEUE_SIZE = int(os.getenv("SYNC_WRITE_QUEUE_SIZE", "8"))
+
+# Attempts made on a batch that keeps hitting transient errors, after the first
+MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "5"))
+
+# Backoff before retry n is a random delay up to min(BACKOFF_MAX, BACKOFF_BASE * 2**n) seconds
+BACKOFF_BASE = float(os.getenv("SYNC_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("SYNC_BACKOFF_MAX", "30"))
+
+# HTTP statuses reported by postgrest-py as the code when the error body is
+# not PostgREST JSON
+TRANSIENT_STATUS_CODES = {'408', '429', '500', '502', '503', '504'}
+
+# Postgres SQLSTATE classes worth retrying: connection failures,
+# serialization failures and deadlocks, insufficient resources, and
+# statement timeouts and shutdowns
+TRANSIENT_SQLSTATE_CLASSES = ('08', '40', '53', '57')
+
+# PostgREST codes for losing its connection pool or schema cache
+TRANSIENT_POSTGREST_CODES = {'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'}
+
+def is_transient(error):
+    """Return True if a failed request may succeed when sent again unchanged"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or '')
+        if len(code) == 3 and code.isdigit():
+            return code in TRANSIENT_STATUS_CODES
+        if len(code) == 5:
+            return code.startswith(TRANSIENT_SQLSTATE_CLASSES)
+        return code in TRANSIENT_POSTGREST_CODES
+    return False
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry number (0-based)"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def chunked(records, batch_size):
+    """Yield lists of up to batch_size records from any iterable"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class _Writer:
+    """Sends batches for one pipeline run and collects the per-record report"""
+
+    def __init__(self, supabase, table_name, concurrency, upsert_options):
+        self.supabase = supabase
+        self.table_name = table_name
+        self.upsert_options = upsert_options
+        # One thread per writer plus one for reading the batches
+        self.executor = ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix='upsert')
+        self.batch_number = 0
+        self.report = {
+            'table': table_name,
+            'written': 0,
+            'failed': [],
+            'results': [],
+            'batches': 0,
+            'retries': 0,
+            'elapsed_s': 0.0,
+        }
+
+    def _upsert(self, chunk):
+        self.supabase.table(self.table_name).upsert(chunk, **self.upsert_options).execute()
+
+    async def _send(self, chunk):
+        """Send one batch, retrying transient errors. Returns (error, attempts)."""
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                await loop.run_in_executor(self.executor, self._upsert, chunk)
+                return None, attempt + 1
+            except Exception as e:
+                if not is_transient(e) or attempt >= MAX_RETRIES:
+                    return e, attempt + 1
+                delay = backoff_delay(attempt)
+                attempt += 1
+                print(f"Batch of {len(chunk)} records hit a transient error, retry {attempt} in {delay:.2f}s: {str(e)}")
+                self.report['retries'] += 1
+                record_retry(self.table_name, len(chunk))
+                await asyncio.sleep(delay)
+
+    def _record(self, chunk, status, attempts, error=None):
+        for record in chunk:
+            self.report['results'].append({
+                'MS_Number': record.get('MS_Number'),
+                'status': status,
+                'attempts': attempts,
+                'error': None if error is None else str(error),
+            })
+
+    async def write(self, chunk):
+        """Write a batch, splitting it in half on a permanent error to isolate bad rows.
+
+        A batch that still hits transient errors after MAX_RETRIES fails as a
+        whole, since splitting it would only multiply the requests during an
+        outage. Returns the records that could not be written.
+        """
+        started = time.perf_counter()
+        error, attempts = await self._send(chunk)
+        elapsed = time.perf_counter() - started
+
+        if error is None:
+            self.batch_number += 1
+            self.report['batches'] += 1
+            self.report['written'] += len(chunk)
+            self._record(chunk, 'written', attempts)
+            rate = len(chunk) / elapsed if elapsed > 0 else float('inf')
+            print(f"Batch {self.batch_number}: upserted {len(chunk)} records in {elapsed:.2f}s ({rate:.0f} records/s)")
+            return []
+        if is_transient(error):
+            print(f"Batch of {len(chunk)} records failed after {attempts} attempts: {str(error)}")
+            self.report['failed'].extend(chunk)
+            self._record(chunk, 'failed', attempts, error)
+            return list(chunk)
+        if len(chunk) == 1:
+            print(f"Error processing MS_Number {chunk[0].get('MS_Number')}: {str(error)}")
+            self.report['failed'].append(chunk[0])
+            self._record(chunk, 'failed', attempts, error)
+            return list(chunk)
+
+        middle = len(chunk) // 2
+        print(f"Batch of {len(chunk)} records failed, retrying as {middle} + {len(chunk) - middle}: {str(error)}")
+        return await self.write(chunk[:middle]) + await self.write(chunk[middle:])
+
+async def upsert_pipeline(supabase, table_name, batches, concurrency=WRITE_CONCURRENCY,
+                          queue_size=WRITE_QUEUE_SIZE, on_batch=None, **upsert_options):
+    """Upsert batches with up to `concurrency` of them in flight and return the report.
+
+    `batches` yields (batch_id, records) pairs and is only consumed as fast
+    as the writers drain a queue of `queue_size`, so a slow server holds
+    back the producer instead of letting batches pile up in memory. It is
+    read on a worker thread, so it may itself fetch from the network. Once a
+    batch is finished, on_batch(batch_id, failed_records) is called if given.
+    Requests go through the shared synchronous client on a small thread
+    pool, which keeps them on its connection pool and in the call trace.
+    """
+    writer = _Writer(supabase, table_name, concurrency, upsert_options)
+    queue = asyncio.Queue(maxsize=queue_size)
+    started = time.perf_counter()
+
+    async def produce():
+        loop = asyncio.get_running_loop()
+        batches_iter = iter(batches)
+        while True:
+            batch = await loop.run_in_executor(writer.executor, next, batches_iter, None)
+            if batch is None:
+                break
+            await queue.put(batch)
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def consume():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            batch_id, chunk = batch
+            failed = await writer.write(chunk)
+            if on_batch is not None:
+                on_batch(batch_id, failed)
+
+    try:
+        await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+    finally:
+        writer.executor.shutdown(wait=True)
+
+    writer.report['elapsed_s'] = round(time.perf_counter() - started, 3)
+    return writer.report
+
+def run_upserts(supabase, table_name, records, batch_size, concurrency=WRITE_CONCURRENCY,
+                queue_size=WRITE_QUEUE_SIZE, on_batch=None, **upsert_options):
+    """Blocking wrapper around upsert_pipeline that cuts records into numbered batches"""
+    return run_batches(supabase, table_name, enumerate(chunked(records, batch_size)),
+                       concurrency=concurrency, queue_size=queue_size, on_batch=on_batch, **upsert_options)
+
+def run_batches(supabase, table_name, batches, concurrency=WRITE_CONCURRENCY,
+                queue_size=WRITE_QUEUE_SIZE, on_batch=None, **upsert_options):
+    """Blocking wrapper around upsert_pipeline for (batch_id, records) pairs"""
+    coroutine = upsert_pipeline(supabase, table_name, batches, concurrency=concurrency,
+                                queue_size=queue_size, on_batch=on_batch, **upsert_options)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # Called from inside an event loop (a notebook, for instance), so run the
+    # pipeline on its own loop in a helper thread
+    result = {}
+    def run():
+        try:
+            result['report'] = asyncio.run(coroutine)
+        except BaseException as e:
+            result['error'] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['report']